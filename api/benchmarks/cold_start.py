@@ -0,0 +1,96 @@
+"""
+Cold-start benchmark.
+
+Starts fresh interpreters that import the app (`import main`) and run the
+fast path of its lifespan, and reports the median time of each phase and
+the slowest imported packages (from `python -X importtime`):
+
+    cd api
+    python -m benchmarks.cold_start --runs 5
+    python -m benchmarks.cold_start --json --budget-ms 1500   # CI
+
+`--budget-ms` exits with status 1 when the median time to accept traffic
+(imports + fast path) exceeds the budget. The deferred startup steps are
+not measured: they run after the worker accepts traffic. Needs the same
+environment variables as the API (.env), but no MongoDB server.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+#Run in each fresh interpreter; prints the phase timings as JSON
+PROBE = """
+import asyncio, json, time
+started = time.perf_counter()
+import main
+imported = time.perf_counter()
+
+async def fast_path():
+    async with main.lifespan(main.app):
+        return time.perf_counter()
+
+accepting = asyncio.run(fast_path())
+print(json.dumps({"imports_ms": (imported - started) * 1000, "fast_path_ms": main.startup.timings["fast_path"] * 1000,
+                  "accepting_ms": (accepting - started) * 1000}))
+"""
+
+
+def probe() -> dict:
+    output = subprocess.run([sys.executable, "-c", PROBE], check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def slowest_packages(top: int) -> list:
+    """Top-level packages of `import main` by import time of their modules."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], check=True, capture_output=True, text=True
+    ).stderr
+    totals = defaultdict(int)
+    for line in stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package", nested
+        # imports indented; summing the self times counts every module once
+        parts = line.split("|")
+        if len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        self_us = int(parts[0].rsplit(":", 1)[1])
+        totals[parts[2].strip().split(".")[0]] += self_us
+    ranked = sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": name, "import_ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10, help="number of slowest packages to report")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--budget-ms", type=float, help="fail when the median time to accept traffic exceeds it")
+    args = parser.parse_args()
+
+    runs = [probe() for _ in range(args.runs)]
+    result = {
+        "runs": args.runs,
+        "median": {phase: round(statistics.median(run[phase] for run in runs), 1) for phase in runs[0]},
+        "max": {phase: round(max(run[phase] for run in runs), 1) for phase in runs[0]},
+        "slowest_packages": slowest_packages(args.top),
+    }
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"{args.runs} cold starts (median / max ms)")
+        for phase in result["median"]:
+            print(f"  {phase:<14} {result['median'][phase]:8.1f} {result['max'][phase]:8.1f}")
+        print("slowest packages (import ms)")
+        for package in result["slowest_packages"]:
+            print(f"  {package['package']:<24} {package['import_ms']:8.1f}")
+
+    if args.budget_ms is not None and result["median"]["accepting_ms"] > args.budget_ms:
+        print(f"cold start over budget: {result['median']['accepting_ms']:.1f} ms > {args.budget_ms:.1f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Synthetic dataset for load tests.
+
+Generates N users, M projects whose member counts follow a heavy-tailed
+(Pareto) distribution, as in real workspaces where most projects are
+small and a few are large, and tasks per project likewise skewed, with
+realistic state/priority/deadline/assignee distributions. Documents have
+the shapes written by the API, are inserted with unordered bulk writes,
+and the project statistics are rebuilt afterwards. Every user's password
+is `DEFAULT_PASSWORD`.
+
+    cd api
+    python -m benchmarks.dataset --users 1000 --projects 300 --tasks 20 --seed 1
+        # seeds the database of MONGO_URL (.env); drops its collections first
+
+`generate` is also used by benchmarks/load_test.py. The same seed gives the
+same documents, with dates relative to the current time.
+"""
+import argparse
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import NamedTuple
+
+from bson import ObjectId
+
+from services.password_hashing import _hash
+
+DEFAULT_PASSWORD = "load-test-password"
+
+#(value, weight)
+STATES = (("NOT STARTED", 35), ("IN PROGRESS", 30), ("SUBMITTED FOR VALIDATION", 10), ("COMPLETED", 25))
+PRIORITIES = (("LOW", 30), ("MEDIUM", 50), ("HIGH", 20))
+INSERT_BATCH_SIZE = 1000
+
+
+class Dataset(NamedTuple):
+    users: list
+    projects: list
+    tasks: list
+
+
+def _pick(rng: random.Random, weighted) -> str:
+    values, weights = zip(*weighted)
+    return rng.choices(values, weights)[0]
+
+
+def _object_id(rng: random.Random, when: datetime) -> ObjectId:
+    # Seeded, and in creation order like server-generated IDs
+    return ObjectId(int(when.timestamp()).to_bytes(4, "big") + rng.randbytes(8))
+
+
+def _skewed(rng: random.Random, mean: float, cap: int) -> int:
+    # Pareto with shape 1.5 has mean 3 * scale
+    return max(1, min(cap, int(rng.paretovariate(1.5) * mean / 3)))
+
+
+def generate(users: int, projects: int, tasks_per_project: float, members_per_project: float = 4,
+             seed: int = 0, password_hash: str = None) -> Dataset:
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    password_hash = password_hash or _hash(DEFAULT_PASSWORD)
+
+    user_docs = [
+        {
+            "_id": _object_id(rng, now - timedelta(days=400)),
+            "email": f"user{i}@load.example.com",
+            "first_name": f"First{i}",
+            "last_name": f"Last{i}",
+            "password": password_hash,
+        }
+        for i in range(users)
+    ]
+
+    project_docs, task_docs = [], []
+    for p in range(projects):
+        members = rng.sample(user_docs, _skewed(rng, members_per_project, len(user_docs)))
+        created_at = now - timedelta(days=rng.randint(0, 365))
+        project = {
+            "_id": _object_id(rng, created_at),
+            "title": f"Project {p}",
+            "description": "Load test project " * rng.randint(1, 6),
+            "members": [
+                {
+                    "_id": user["_id"],
+                    "first_name": user["first_name"],
+                    "last_name": user["last_name"],
+                    "email": user["email"],
+                    "role": "manager" if index == 0 or rng.random() < 0.1 else "member",
+                }
+                for index, user in enumerate(members)
+            ],
+            "created_at": created_at,
+            "updated_at": created_at,
+            "revision": 1,
+        }
+        project_docs.append(project)
+
+        for t in range(_skewed(rng, tasks_per_project, 50 * max(1, int(tasks_per_project)))):
+            assignee = rng.choice(members) if rng.random() < 0.7 else None
+            task_created = created_at + timedelta(hours=rng.randint(0, 24 * 30))
+            task_docs.append({
+                "_id": _object_id(rng, task_created),
+                "title": f"Task {t} of project {p}",
+                "description": "Load test task " * rng.randint(1, 12),
+                "project": {"_id": project["_id"], "project_title": project["title"]},
+                "assigned_to": {
+                    "_id": assignee["_id"],
+                    "first_name": assignee["first_name"],
+                    "last_name": assignee["last_name"],
+                    "email": assignee["email"],
+                } if assignee else None,
+                "state": _pick(rng, STATES),
+                "priority": _pick(rng, PRIORITIES),
+                # A fifth without deadline, the rest from overdue to two months ahead
+                "deadline": now + timedelta(days=rng.uniform(-10, 60)) if rng.random() < 0.8 else None,
+                "created_at": task_created,
+                "updated_at": task_created,
+            })
+    return Dataset(user_docs, project_docs, task_docs)
+
+
+async def insert(db, dataset: Dataset):
+    """Insert `dataset` with unordered bulk writes, then build the project stats."""
+    from services.project_stats import rebuild_stats
+
+    for collection, documents in (("users", dataset.users), ("projects", dataset.projects), ("tasks", dataset.tasks)):
+        for start in range(0, len(documents), INSERT_BATCH_SIZE):
+            await db[collection].insert_many(documents[start:start + INSERT_BATCH_SIZE], ordered=False)
+    for project in dataset.projects:
+        await rebuild_stats(project["_id"])
+
+
+async def _main(args):
+    from db import close_mongo_connection, connect_to_mongo, get_database
+    from services.indexes import migrate
+
+    await connect_to_mongo()
+    db = get_database()
+    try:
+        for collection in ("users", "projects", "tasks", "project_stats", "refresh_tokens"):
+            await db[collection].drop()
+        await migrate(db)
+        dataset = generate(args.users, args.projects, args.tasks, args.members, seed=args.seed)
+        await insert(db, dataset)
+        print(f"Inserted {len(dataset.users)} users, {len(dataset.projects)} projects, {len(dataset.tasks)} tasks")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--projects", type=int, default=300)
+    parser.add_argument("--tasks", type=float, default=20, help="mean number of tasks per project")
+    parser.add_argument("--members", type=float, default=4, help="mean number of members per project")
+    parser.add_argument("--seed", type=int, default=0)
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,182 @@
+"""
+Peak memory of the task export.
+
+Seeds one project with N tasks, then reads GET /projects/{id}/tasks/export
+through the app (route, Motor cursor and StreamingResponse, driven as an
+ASGI call that discards each body chunk as it is sent), and, for
+comparison, the old buffered path (to_list + one JSON body). Each mode
+runs in its own process and the peak RSS growth of the read is reported.
+Exits with status 1 if the streaming export grows by more than
+--max-growth-mb.
+
+The database is one of (see benchmarks/load_test.py):
+
+    --mongo-url mongodb://localhost:27017   an existing server (uses --database, dropped afterwards)
+    --mongod [PATH]                         a mongod launched on a free port and a temporary dbpath
+    --memory                                mongomock-motor, in-memory; the seeded tasks count in
+                                            the process's memory, so only the growth is meaningful
+
+    cd api
+    python -m benchmarks.export_memory --mongod --tasks 100000
+
+Needs the same environment variables as the API (.env).
+"""
+import argparse
+import asyncio
+import json
+import resource
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+
+import db as database
+from benchmarks.load_test import LocalMongod, attach_database
+from services.export import _default
+
+SEED_BATCH_SIZE = 1000
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def seed(count: int) -> tuple[ObjectId, dict]:
+    """Insert a user managing one project with `count` tasks, in batches."""
+    db = database.get_database()
+    now = datetime.now()
+    user = {"_id": ObjectId(), "email": "export@example.com", "first_name": "Ann", "last_name": "Lee", "password": ""}
+    project_id = ObjectId()
+    await db["users"].insert_one(user)
+    await db["projects"].insert_one({
+        "_id": project_id,
+        "title": "Benchmark",
+        "description": "Export benchmark",
+        "members": [{"_id": user["_id"], "first_name": "Ann", "last_name": "Lee", "email": user["email"], "role": "manager"}],
+        "created_at": now,
+    })
+    for start in range(0, count, SEED_BATCH_SIZE):
+        await db["tasks"].insert_many([
+            {
+                "_id": ObjectId(),
+                "title": f"Task {i}",
+                "description": "Lorem ipsum dolor sit amet " * 8,
+                "project": {"_id": project_id, "project_title": "Benchmark"},
+                "assigned_to": None,
+                "state": "NOT STARTED",
+                "priority": "MEDIUM",
+                "deadline": now + timedelta(days=i % 30),
+                "created_at": now + timedelta(milliseconds=i),
+                "updated_at": now,
+            }
+            for i in range(start, min(start + SEED_BATCH_SIZE, count))
+        ], ordered=False)
+    return project_id, user
+
+
+async def read_stream(app, project_id: ObjectId, token: str) -> int:
+    """Run the export route as an ASGI call; returns the body size."""
+    written = 0
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http",
+        "path": f"/projects/{project_id}/tasks/export", "raw_path": f"/projects/{project_id}/tasks/export".encode(),
+        "query_string": b"format=ndjson", "root_path": "", "server": ("benchmark", 80), "client": ("127.0.0.1", 0),
+        "headers": [(b"host", b"benchmark"), (b"authorization", f"Bearer {token}".encode())],
+    }
+    status_code = None
+    requested, finished = False, asyncio.Event()
+
+    async def receive():
+        # The request once, then (StreamingResponse listens for it) a disconnect after the last chunk
+        nonlocal requested
+        if not requested:
+            requested = True
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal written, status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+        elif message["type"] == "http.response.body":
+            written += len(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    await app(scope, receive, send)
+    if status_code != 200:
+        raise RuntimeError(f"export answered {status_code}")
+    return written
+
+
+async def read_buffered(project_id: ObjectId) -> int:
+    tasks = await database.get_database()["tasks"].find({"project._id": project_id}).sort(
+        [("created_at", 1), ("_id", 1)]
+    ).to_list(length=None)
+    return len(json.dumps(tasks, default=_default).encode())
+
+
+async def child_async(args) -> dict:
+    from main import app
+    from services.auth import create_access_token, principal_claims
+
+    cleanup = await attach_database(args)
+    try:
+        project_id, user = await seed(args.tasks)
+        token = create_access_token(principal_claims(user))
+        before = peak_rss_mb()
+        if args.child == "stream":
+            written = await read_stream(app, project_id, token)
+        else:
+            written = await read_buffered(project_id)
+        return {"mode": args.child, "bytes": written, "growth_mb": peak_rss_mb() - before}
+    finally:
+        await cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--mongo-url", help="existing MongoDB server")
+    backend.add_argument("--mongod", nargs="?", const="mongod", metavar="PATH", help="launch a local mongod")
+    backend.add_argument("--memory", action="store_true", help="in-memory mongomock-motor")
+    parser.add_argument("--database", default="export_benchmark", help="database name, dropped before and after the run")
+    parser.add_argument("--tasks", type=int, default=100_000)
+    parser.add_argument("--max-growth-mb", type=float, default=50.0)
+    parser.add_argument("--child", choices=["stream", "buffered"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(asyncio.run(child_async(args))))
+        return
+
+    mongod = None
+    if args.mongod:
+        mongod = LocalMongod(args.mongod)
+        mongod.start()
+        args.mongo_url = mongod.url
+    backend_args = ["--memory"] if args.memory else ["--mongo-url", args.mongo_url]
+    results = {}
+    try:
+        for mode in ("stream", "buffered"):
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.export_memory", *backend_args, "--database", args.database,
+                 "--child", mode, "--tasks", str(args.tasks)],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results[mode] = json.loads(out.strip().splitlines()[-1])
+            print(f"{mode:<9} tasks={args.tasks} bytes={results[mode]['bytes']} peak RSS growth={results[mode]['growth_mb']:.1f} MB")
+    finally:
+        if mongod is not None:
+            mongod.stop()
+
+    if results["stream"]["growth_mb"] > args.max_growth_mb:
+        print(f"FAIL: streaming export grew by more than {args.max_growth_mb} MB")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
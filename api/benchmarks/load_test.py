@@ -0,0 +1,318 @@
+"""
+End-to-end load test of the API.
+
+Seeds a synthetic dataset (benchmarks/dataset.py), points the app's
+database at it, and drives a mix of scenarios through an async HTTP client
+talking to `main.app` in-process, with `--concurrency` virtual users for
+`--duration` seconds. Reports the throughput and the p50/p95/p99 latency
+of every route.
+
+The database is one of:
+
+    --mongo-url mongodb://localhost:27017   an existing server (uses --database, dropped afterwards)
+    --mongod [PATH]                         a mongod launched on a free port and a temporary dbpath
+    --memory                                mongomock-motor (pip install mongomock-motor), in-memory;
+                                            it lacks features some routes use (pipeline $lookup), and
+                                            those requests show up as 500s
+
+Scenario mixes (`--mix`): login-storm, dashboard, task-edits, mixed, or
+custom weights such as `login=1,dashboard=5`. Examples:
+
+    cd api
+    python -m benchmarks.load_test --mongod --mix mixed --concurrency 50 --duration 60
+    python -m benchmarks.load_test --mongo-url mongodb://localhost:27017 --mix login-storm --json out.json
+
+Client and app share the event loop, so latencies include the client's
+own overhead; compare runs with each other rather than with production.
+Needs the same environment variables as the API (.env).
+"""
+import argparse
+import asyncio
+import json
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Optional
+
+import httpx
+
+import db as database
+from benchmarks.dataset import DEFAULT_PASSWORD, generate, insert
+from benchmarks.login_storm import percentile
+from config import settings
+
+MIXES = {
+    "login-storm": {"login": 1},
+    "dashboard": {"dashboard": 6, "list_projects": 2, "list_tasks": 2},
+    "task-edits": {"task_edit": 7, "list_tasks": 3},
+    "mixed": {"login": 1, "list_projects": 3, "dashboard": 3, "list_tasks": 4, "task_edit": 2},
+}
+STATES = ("NOT STARTED", "IN PROGRESS", "SUBMITTED FOR VALIDATION", "COMPLETED")
+
+
+class Session:
+    """A logged-in manager with the projects (and their task IDs) they manage."""
+
+    def __init__(self, token: str, projects: list, tasks: dict):
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.projects = projects
+        self.tasks = tasks
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, dataset, seed: int):
+        self.client = client
+        self.dataset = dataset
+        self.rng = random.Random(seed)
+        #route template -> latencies (seconds); route template -> status -> count
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(lambda: defaultdict(int))
+        self.sessions: list[Session] = []
+
+    async def request(self, method: str, route: str, path: str, **kwargs) -> Optional[httpx.Response]:
+        started = time.perf_counter()
+        response = await self.client.request(method, path, **kwargs)
+        self.latencies[f"{method} {route}"].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[f"{method} {route}"][response.status_code] += 1
+            return None
+        return response
+
+    async def open_sessions(self, count: int):
+        tasks_by_project = defaultdict(list)
+        for task in self.dataset.tasks:
+            tasks_by_project[task["project"]["_id"]].append(str(task["_id"]))
+        managed = defaultdict(list)
+        for project in self.dataset.projects:
+            if tasks_by_project[project["_id"]]:
+                for member in project["members"]:
+                    if member["role"] == "manager":
+                        managed[member["email"]].append(project["_id"])
+        for email in self.rng.sample(sorted(managed), min(count, len(managed))):
+            response = await self.client.post("/auth/login", json={"email": email, "password": DEFAULT_PASSWORD})
+            response.raise_for_status()
+            projects = managed[email]
+            self.sessions.append(Session(
+                response.json()["access_token"],
+                [str(project_id) for project_id in projects],
+                {str(project_id): tasks_by_project[project_id] for project_id in projects},
+            ))
+
+    def _session(self) -> tuple[Session, str]:
+        session = self.rng.choice(self.sessions)
+        return session, self.rng.choice(session.projects)
+
+    #Scenarios: one user action each, possibly several requests
+
+    async def login(self):
+        user = self.rng.choice(self.dataset.users)
+        await self.request("POST", "/auth/login", "/auth/login", json={"email": user["email"], "password": DEFAULT_PASSWORD})
+
+    async def list_projects(self):
+        session, _ = self._session()
+        await self.request("GET", "/projects/", "/projects/", headers=session.headers)
+
+    async def dashboard(self):
+        session, project_id = self._session()
+        await self.request("GET", "/projects/{id}/dashboard", f"/projects/{project_id}/dashboard", headers=session.headers)
+
+    async def list_tasks(self):
+        session, project_id = self._session()
+        await self.request(
+            "GET", "/projects/{id}/tasks/", f"/projects/{project_id}/tasks/",
+            params={"limit": 50, "sort": self.rng.choice(("created_at", "deadline"))}, headers=session.headers,
+        )
+
+    async def task_edit(self):
+        session, project_id = self._session()
+        task_id = self.rng.choice(session.tasks[project_id])
+        path = f"/projects/{project_id}/tasks/{task_id}"
+        if await self.request("GET", "/projects/{project_id}/tasks/{task_id}", path, headers=session.headers):
+            await self.request(
+                "PATCH", "/projects/{project_id}/tasks/{task_id}", path,
+                json={"state": self.rng.choice(STATES)}, headers=session.headers,
+            )
+
+    async def run(self, mix: dict, concurrency: int, duration: float) -> float:
+        scenarios = [getattr(self, name) for name in mix]
+        weights = list(mix.values())
+        deadline = time.perf_counter() + duration
+
+        async def virtual_user():
+            while time.perf_counter() < deadline:
+                await self.rng.choices(scenarios, weights)[0]()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user() for _ in range(concurrency)))
+        return time.perf_counter() - started
+
+    def report(self, elapsed: float) -> dict:
+        routes = {}
+        for route, samples in sorted(self.latencies.items()):
+            routes[route] = {
+                "requests": len(samples),
+                "errors": dict(self.errors.get(route, {})),
+                "throughput_rps": round(len(samples) / elapsed, 1),
+                "p50_ms": round(percentile(samples, 50) * 1000, 2),
+                "p95_ms": round(percentile(samples, 95) * 1000, 2),
+                "p99_ms": round(percentile(samples, 99) * 1000, 2),
+                "max_ms": round(max(samples) * 1000, 2),
+            }
+        total = sum(len(samples) for samples in self.latencies.values())
+        return {"elapsed_s": round(elapsed, 2), "requests": total, "throughput_rps": round(total / elapsed, 1), "routes": routes}
+
+
+def parse_mix(value: str) -> dict:
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        if name not in MIXES["mixed"]:
+            raise argparse.ArgumentTypeError(f"unknown scenario {name!r}, expected one of {', '.join(MIXES['mixed'])}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LocalMongod:
+    """A throwaway mongod on a free port and a temporary dbpath."""
+
+    def __init__(self, binary: str):
+        self.binary = binary
+        self.dbpath = tempfile.mkdtemp(prefix="load-test-mongod-")
+        self.port = _free_port()
+        self.process: Optional[subprocess.Popen] = None
+
+    @property
+    def url(self) -> str:
+        return f"mongodb://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 30):
+        self.process = subprocess.Popen(
+            [self.binary, "--dbpath", self.dbpath, "--port", str(self.port), "--bind_ip", "127.0.0.1", "--quiet"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"mongod exited with status {self.process.returncode}")
+            try:
+                with socket.create_connection(("127.0.0.1", self.port), timeout=0.5):
+                    return
+            except OSError:
+                time.sleep(0.2)
+        raise RuntimeError("mongod did not start in time")
+
+    def stop(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.wait(timeout=30)
+        shutil.rmtree(self.dbpath, ignore_errors=True)
+
+
+async def attach_database(args):
+    """Point `db.get_database()` at the load test database; returns a cleanup coroutine."""
+    if args.memory:
+        from mongomock_motor import AsyncMongoMockClient
+
+        database.client = AsyncMongoMockClient()
+        database.db = database.analytics_db = database.client[args.database]
+
+        async def cleanup():
+            pass
+        return cleanup
+
+    settings.mongo_url = args.mongo_url
+    await database.connect_to_mongo()
+    database.db = database.client[args.database]
+    database.analytics_db = database.client.get_database(args.database, read_preference=database.analytics_read_preference())
+    await database.client.drop_database(args.database)
+
+    async def cleanup():
+        await database.client.drop_database(args.database)
+        await database.close_mongo_connection()
+    return cleanup
+
+
+async def main_async(args) -> dict:
+    from main import app
+    from services.indexes import migrate
+    from services.password_hashing import password_hasher
+
+    cleanup = await attach_database(args)
+    try:
+        if not args.memory:
+            await migrate(database.get_database())
+        dataset = generate(args.users, args.projects, args.tasks, seed=args.seed)
+        await insert(database.get_database(), dataset)
+        print(f"Dataset: {len(dataset.users)} users, {len(dataset.projects)} projects, {len(dataset.tasks)} tasks",
+              file=sys.stderr)
+
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load-test") as client:
+            load_test = LoadTest(client, dataset, args.seed)
+            await load_test.open_sessions(args.sessions)
+            elapsed = await load_test.run(args.mix, args.concurrency, args.duration)
+        return load_test.report(elapsed)
+    finally:
+        password_hasher.shutdown()
+        await cleanup()
+
+
+def print_report(report: dict):
+    print(f"{report['requests']} requests in {report['elapsed_s']}s, {report['throughput_rps']} req/s")
+    print(f"{'route':<48} {'requests':>8} {'errors':>7} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for route, stats in report["routes"].items():
+        errors = sum(stats["errors"].values())
+        print(f"{route:<48} {stats['requests']:>8} {errors:>7} {stats['throughput_rps']:>8} {stats['p50_ms']:>8} "
+              f"{stats['p95_ms']:>8} {stats['p99_ms']:>8} {stats['max_ms']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    backend = parser.add_mutually_exclusive_group(required=True)
+    backend.add_argument("--mongo-url", help="existing MongoDB server")
+    backend.add_argument("--mongod", nargs="?", const="mongod", metavar="PATH", help="launch a local mongod")
+    backend.add_argument("--memory", action="store_true", help="in-memory mongomock-motor")
+    parser.add_argument("--database", default="load_test", help="database name, dropped before and after the run")
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--projects", type=int, default=150)
+    parser.add_argument("--tasks", type=float, default=20, help="mean number of tasks per project")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mix", type=parse_mix, default="mixed")
+    parser.add_argument("--concurrency", type=int, default=20, help="virtual users")
+    parser.add_argument("--duration", type=float, default=30, help="seconds")
+    parser.add_argument("--sessions", type=int, default=20, help="logged-in managers shared by the virtual users")
+    parser.add_argument("--json", help="also write the report to this file")
+    args = parser.parse_args()
+
+    mongod = None
+    if args.mongod:
+        mongod = LocalMongod(args.mongod)
+        mongod.start()
+        args.mongo_url = mongod.url
+    try:
+        report = asyncio.run(main_async(args))
+    finally:
+        if mongod is not None:
+            mongod.stop()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
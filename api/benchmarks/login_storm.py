@@ -0,0 +1,93 @@
+"""
+Login storm benchmark.
+
+Fires a burst of bcrypt password checks at a throwaway FastAPI app while
+an unrelated endpoint is polled, and reports the latency percentiles of
+that unrelated endpoint. Run it once with the checks done inline (the old
+behaviour) and once through the password worker pool:
+
+    cd api
+    python -m benchmarks.login_storm --logins 200 --pings 400
+
+Needs the same environment variables as the API (.env).
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from services.password_hashing import PasswordHasher, _hash, _verify
+
+
+def build_app(hasher: PasswordHasher, hashed: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.post("/login-inline")
+    async def login_inline():
+        return {"ok": _verify("password", hashed)}
+
+    @app.post("/login")
+    async def login():
+        return {"ok": await hasher.verify("password", hashed)}
+
+    @app.get("/ping")
+    async def ping():
+        return {"pong": True}
+
+    return app
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run(login_path: str, logins: int, pings: int, interval: float, hasher: PasswordHasher, hashed: str):
+    app = build_app(hasher, hashed)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def ping_loop():
+            # Latency is measured from the time the ping *should* have been
+            # sent, so time spent waiting for a blocked loop is counted.
+            latencies = []
+            first = time.perf_counter()
+            for i in range(pings):
+                scheduled = first + i * interval
+                await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+                await client.get("/ping")
+                latencies.append((time.perf_counter() - scheduled) * 1000)
+            return latencies
+
+        started = time.perf_counter()
+        ping_task = asyncio.create_task(ping_loop())
+        await asyncio.gather(*(client.post(login_path) for _ in range(logins)))
+        latencies = await ping_task
+        elapsed = time.perf_counter() - started
+
+    print(f"{login_path:<14} logins={logins} elapsed={elapsed:.2f}s "
+          f"ping p50={statistics.median(latencies):.2f}ms "
+          f"p99={percentile(latencies, 99):.2f}ms max={max(latencies):.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--pings", type=int, default=300)
+    parser.add_argument("--interval-ms", type=float, default=10.0)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    args = parser.parse_args()
+
+    hashed = _hash("password")
+    for path in ("/login-inline", "/login"):
+        hasher = PasswordHasher(workers=args.workers, max_concurrency=args.max_concurrency)
+        asyncio.run(run(path, args.logins, args.pings, args.interval_ms / 1000, hasher, hashed))
+        hasher.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+"""
+Micro-benchmarks of the request hot paths.
+
+Times, in-process and without a database:
+
+- the JWTs: `create_access_token` and `jwt.decode` (services/auth.py)
+- `PyObjectId` validation from a string and from an ObjectId (models/utils.py)
+- `Task` / `Project` validation of 1, 100 and 10k documents, and their
+  JSON serialization
+- the `TaskUpdate` normalization of `update_task` (`_task_update_doc`)
+
+Each case is timed over `--repeat` rounds of enough calls to last
+`--min-time` seconds and the median time per call is kept. Results are
+saved as JSON baselines, and `compare` fails (exit status 1) when a case
+got slower than its baseline by more than `--threshold`:
+
+    cd api
+    python -m benchmarks.micro run                          # print the results
+    python -m benchmarks.micro save                         # write benchmarks/baselines/micro.json
+    python -m benchmarks.micro compare --threshold 0.2      # CI: flag >20% regressions
+    python -m benchmarks.micro run --filter task --json out.json
+
+Baselines only compare with runs on the same kind of machine. Needs the
+same environment variables as the API (.env).
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from bson import ObjectId
+from jose import jwt
+from pydantic import BaseModel, TypeAdapter
+
+from benchmarks.serialization import fake_tasks
+from config import settings
+from models.project import Project
+from models.task import Task, TaskUpdate
+from models.utils import PyObjectId
+from routes.projects import _task_update_doc
+from services.auth import create_access_token
+
+DEFAULT_BASELINE = Path(__file__).parent / "baselines" / "micro.json"
+SIZES = (1, 100, 10_000)
+
+
+def fake_projects(count: int, members: int = 5) -> list:
+    now = datetime.now()
+    return [
+        {
+            "_id": ObjectId(),
+            "title": f"Project {i}",
+            "description": "Lorem ipsum dolor sit amet " * 4,
+            "members": [
+                {"_id": ObjectId(), "first_name": "Ann", "last_name": "Lee", "email": f"user{m}@example.com",
+                 "role": "manager" if m == 0 else "member"}
+                for m in range(members)
+            ],
+            "created_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+class ObjectIdHolder(BaseModel):
+    id: PyObjectId
+
+
+def build_cases() -> dict[str, Callable[[], object]]:
+    """Case name -> zero-argument callable timed by the runner."""
+    claims = {"sub": "ann@example.com", "uid": str(ObjectId()), "first_name": "Ann", "last_name": "Lee"}
+    token = create_access_token(claims, timedelta(minutes=settings.access_token_expire_minutes))
+    object_id = ObjectId()
+    object_id_str = str(object_id)
+
+    task = fake_tasks(1)[0]
+    user = {"_id": ObjectId(), "email": "ann@example.com"}
+    update = TaskUpdate.model_validate({
+        "title": "Renamed task",
+        "state": "IN PROGRESS",
+        "deadline": "2030-01-01T12:00:00",
+        "assigned_to": {"_id": str(user["_id"]), "first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"},
+    })
+
+    cases = {
+        "auth.create_access_token": lambda: create_access_token(claims, timedelta(minutes=15)),
+        "auth.jwt_decode": lambda: jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm]),
+        "models.py_object_id.from_str": lambda: ObjectIdHolder(id=object_id_str),
+        "models.py_object_id.from_object_id": lambda: ObjectIdHolder(id=object_id),
+        "update_task.normalize": lambda: _task_update_doc(task, "manager", user, update),
+    }
+    for name, model, factory in (("task", Task, fake_tasks), ("project", Project, fake_projects)):
+        adapter = TypeAdapter(list[model])
+        for size in SIZES:
+            documents = factory(size)
+            models = adapter.validate_python(documents)
+            cases[f"models.{name}.validate.{size}"] = lambda adapter=adapter, documents=documents: adapter.validate_python(documents)
+            cases[f"models.{name}.dump_json.{size}"] = lambda adapter=adapter, models=models: adapter.dump_json(models, by_alias=True)
+    return cases
+
+
+def time_case(fn: Callable[[], object], min_time: float, repeat: int) -> dict:
+    # Calibrate the calls per round so a round lasts at least `min_time`
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        number = max(number * 2, int(number * min_time / max(elapsed, 1e-9)))
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        rounds.append((time.perf_counter() - started) / number)
+    return {
+        "median_us": round(statistics.median(rounds) * 1e6, 3),
+        "min_us": round(min(rounds) * 1e6, 3),
+        "calls_per_round": number,
+    }
+
+
+def run(filter: str, min_time: float, repeat: int) -> dict:
+    results = {}
+    for name, fn in build_cases().items():
+        if filter and filter not in name:
+            continue
+        results[name] = time_case(fn, min_time, repeat)
+        print(f"  {name:<40} {results[name]['median_us']:>14.3f} us", file=sys.stderr)
+    return {
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "results": results,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list:
+    """Print the comparison table; returns the names of the regressed cases."""
+    regressions = []
+    print(f"{'case':<40} {'baseline us':>14} {'current us':>14} {'change':>8}")
+    for name, result in current["results"].items():
+        reference = baseline["results"].get(name)
+        if reference is None:
+            print(f"{name:<40} {'-':>14} {result['median_us']:>14.3f} {'new':>8}")
+            continue
+        change = result["median_us"] / reference["median_us"] - 1
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:<40} {reference['median_us']:>14.3f} {result['median_us']:>14.3f} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["run", "save", "compare"])
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.2, help="relative slowdown flagged by compare")
+    parser.add_argument("--filter", default="", help="only the cases whose name contains this")
+    parser.add_argument("--min-time", type=float, default=0.05, help="minimum duration of a round, in seconds")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--json", type=Path, help="also write the results to this file")
+    args = parser.parse_args()
+
+    # update_task logs every updated field
+    logging.getLogger("inf3-projet-api").setLevel(logging.WARNING)
+    current = run(args.filter, args.min_time, args.repeat)
+    if args.json:
+        args.json.write_text(json.dumps(current, indent=2) + "\n")
+
+    if args.command == "save":
+        args.baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.baseline.write_text(json.dumps(current, indent=2) + "\n")
+        print(f"Baseline written to {args.baseline}")
+    elif args.command == "compare":
+        baseline = json.loads(args.baseline.read_text())
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+    else:
+        print(json.dumps(current["results"], indent=2))
+
+
+if __name__ == "__main__":
+    main()
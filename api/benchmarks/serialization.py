@@ -0,0 +1,78 @@
+"""
+Throughput of the task list serialization.
+
+Serializes a page of N synthetic task documents the way FastAPI does for
+a route declaring `response_model=list[TaskListItem]` (validation of every
+document, `serialize`, then `JSONResponse`), and through the
+`DocumentResponse` fast path, and reports documents per second for both.
+
+    cd api
+    python -m benchmarks.serialization --tasks 1000 --rounds 50
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from models.task import TaskListItem
+from services.serialization import DocumentResponse
+
+
+def fake_tasks(count: int) -> list:
+    project_id, user_id = ObjectId(), ObjectId()
+    now = datetime.now()
+    return [
+        {
+            "_id": ObjectId(),
+            "project": {"_id": project_id, "project_title": "Benchmark"},
+            "title": f"Task {i}",
+            "description": "Lorem ipsum dolor sit amet " * 8,
+            "assigned_to": {"_id": user_id, "first_name": "Ann", "last_name": "Lee", "email": "ann@example.com"} if i % 2 else None,
+            "state": "NOT STARTED",
+            "priority": "MEDIUM",
+            "deadline": now + timedelta(days=i % 30),
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(count)
+    ]
+
+
+async def response_model_path(field, tasks: list) -> bytes:
+    content = await serialize_response(field=field, response_content=tasks, exclude_unset=True)
+    return JSONResponse(content).body
+
+
+async def fast_path(field, tasks: list) -> bytes:
+    return DocumentResponse(tasks).body
+
+
+async def measure(runner, field, tasks: list, rounds: int) -> tuple:
+    body = await runner(field, tasks)
+    start = time.perf_counter()
+    for _ in range(rounds):
+        await runner(field, tasks)
+    elapsed = time.perf_counter() - start
+    return len(tasks) * rounds / elapsed, len(body)
+
+
+async def main(args):
+    field = create_model_field(name="Response_get_project_tasks", type_=list[TaskListItem], mode="serialization")
+    tasks = fake_tasks(args.tasks)
+    results = {}
+    for name, runner in (("response_model", response_model_path), ("orjson", fast_path)):
+        results[name], size = await measure(runner, field, tasks, args.rounds)
+        print(f"{name:<15} tasks={args.tasks} bytes={size} {results[name]:>12,.0f} docs/s")
+    print(f"speedup x{results['orjson'] / results['response_model']:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tasks", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=50)
+    asyncio.run(main(parser.parse_args()))
@@ -1,3 +1,5 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -6,8 +8,83 @@ class Settings(BaseSettings):
     algorithm: str
     access_token_expire_minutes: int
     refresh_token_expire_days: int 
+
+    # MongoDB client: pool limits are per process, so size them against the
+    # number of uvicorn workers (see the checkout waits in services.metrics)
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: int = 300000
+    mongo_wait_queue_timeout_ms: Optional[int] = None
+    mongo_server_selection_timeout_ms: int = 5000
+    mongo_connect_timeout_ms: int = 5000
+    mongo_socket_timeout_ms: Optional[int] = 30000
+    # Wire compression, in order of preference; unavailable ones are skipped
+    mongo_compressors: str = "zstd,snappy,zlib"
+    # Read preference of the analytics aggregations; secondaries may lag,
+    # bound it with a max staleness (at least 90 seconds)
+    analytics_read_preference: Literal["primary", "primaryPreferred", "secondary", "secondaryPreferred", "nearest"] = "primary"
+    analytics_max_staleness_seconds: Optional[int] = None
+    # Create missing registry indexes in the deferred startup steps
+    # (services.startup). Off: indexes are built by `python -m
+    # services.indexes migrate` at deploy time, not by every worker boot
+    sync_indexes_on_startup: bool = False
+    # Attempts of a failing deferred startup step before /healthz fails
+    startup_step_max_attempts: int = 8
+
+    # Password hashing worker pool
+    password_hash_workers: int = 4
+    password_hash_max_concurrency: int = 8
+    password_hash_use_processes: bool = False
+
+    # Authenticated principal cache (get_current_user); per worker, so the
+    # TTL bounds how long other workers serve a renamed user's old name
+    principal_cache_size: int = 10000
+    principal_cache_ttl_seconds: float = 60
+    # Read-only routes trust the signed user claims of the access token
+    trust_token_claims: bool = False
+
+    # Project membership/role cache (project_id -> {user_id: role}); the
+    # TTL bounds how long other workers keep serving a project after it is
+    # marked for deletion or a member is removed
+    membership_cache_size: int = 10000
+    membership_cache_ttl_seconds: float = 5
+
+    # Analytics result cache, invalidated per project on every write
+    analytics_cache_enabled: bool = True
+    analytics_cache_ttl_seconds: float = 60
+    analytics_cache_max_entries: int = 5000
+    analytics_cache_max_bytes: int = 32 * 1024 * 1024
+
+    # Streaming task export: Mongo batch size / documents per written chunk
+    export_batch_size: int = 1000
+
+    # List endpoints encode trusted DB documents with orjson instead of
+    # validating them against their response_model
+    fast_serialization: bool = True
+
+    # Maximum number of operations of POST /projects/{id}/tasks/bulk
+    bulk_max_operations: int = 2000
+
+    # Background propagation of user/project renames into their copies
+    propagation_batch_size: int = 500
+    propagation_batch_interval_seconds: float = 0.1
+    propagation_lease_seconds: float = 60
+    propagation_poll_interval_seconds: float = 30
+
+    # Background deletion of the tasks of deleted projects
+    project_delete_batch_size: int = 1000
+    project_delete_batch_interval_seconds: float = 0.05
+    project_delete_lease_seconds: float = 60
+    project_delete_poll_interval_seconds: float = 60
+
+    # Project event WebSockets: events buffered per connection before the
+    # connection is evicted as a slow consumer
+    events_queue_size: int = 100
+    # How often a connection re-checks in Mongo that its user still
+    # belongs to the project (memberships changed by other workers)
+    events_access_check_seconds: float = 30
     
     class Config:
         env_file = ".env"
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -1,26 +1,81 @@
 import os
 from motor.motor_asyncio import AsyncIOMotorClient
 from config import settings
-from pymongo import ASCENDING
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+from services.metrics import command_metrics, pool_metrics
 
 
 client = None
 db = None
+#`db` with the analytics read preference
+analytics_db = None
+#Whether the server accepts multi-document transactions (replica set or
+#mongos), probed once on first use
+_transactions_supported = None
+
+READ_PREFERENCES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": settings.mongo_max_pool_size,
+        "minPoolSize": settings.mongo_min_pool_size,
+        "maxIdleTimeMS": settings.mongo_max_idle_time_ms,
+        "serverSelectionTimeoutMS": settings.mongo_server_selection_timeout_ms,
+        "connectTimeoutMS": settings.mongo_connect_timeout_ms,
+        "socketTimeoutMS": settings.mongo_socket_timeout_ms,
+        "waitQueueTimeoutMS": settings.mongo_wait_queue_timeout_ms,
+        "event_listeners": [pool_metrics, command_metrics],
+    }
+    compressors = [name.strip() for name in settings.mongo_compressors.split(",") if name.strip()]
+    if compressors:
+        options["compressors"] = compressors
+    return {key: value for key, value in options.items() if value is not None}
+
+def analytics_read_preference():
+    mode = READ_PREFERENCES[settings.analytics_read_preference]
+    if mode is Primary:
+        return Primary()
+    return mode(max_staleness=settings.analytics_max_staleness_seconds or -1)
 
 async def connect_to_mongo():
-    global client, db
-    client = AsyncIOMotorClient(settings.mongo_url)
+    global client, db, analytics_db
+    client = AsyncIOMotorClient(settings.mongo_url, **client_options())
     db = client.project
-    await db["users"].create_index([("email", ASCENDING)], unique=True)
-    await db["tasks"].create_index([("project._id", ASCENDING)])
-    await db["tasks"].create_index([("project._id", ASCENDING), ("state", ASCENDING), ("priority", ASCENDING)])
-    await db["tasks"].create_index([("assigned_to._id", ASCENDING), ("state", ASCENDING)])
-    await db["projects"].create_index([("members._id", ASCENDING)]) 
-    await db["projects"].create_index([("members._id", ASCENDING), ("members.role", ASCENDING)])
+    analytics_db = client.get_database(db.name, read_preference=analytics_read_preference())
 
 async def close_mongo_connection():
     global client
     client.close()
 
 def get_database():
-    return db
\ No newline at end of file
+    return db
+
+def get_analytics_database():
+    """Database for the analytics aggregations, which may read from
+    secondaries and so lag behind the latest writes."""
+    return analytics_db
+
+async def transactions_supported() -> bool:
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await db.command("hello")
+            _transactions_supported = bool(hello.get("setName") or hello.get("msg") == "isdbgrid")
+        except Exception:
+            _transactions_supported = False
+    return _transactions_supported
+
+async def run_in_transaction(callback):
+    """Await `callback(session)` inside a transaction when the deployment
+    supports them, else `callback(None)` (standalone server)."""
+    if not await transactions_supported():
+        return await callback(None)
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            return await callback(session)
\ No newline at end of file
@@ -1,3 +1,7 @@
+import time
+# Covers the imports of the app (FastAPI, pydantic models, passlib, jose, motor)
+_imports_started = time.perf_counter()
+
 from fastapi import FastAPI
 import logging
 from routes.auth import auth_router
@@ -6,14 +10,35 @@ from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from routes.projects import project_router
 from routes.users import user_router
+from routes.health import health_router
+from services.metrics import DB_CALLS_HEADER, MetricsMiddleware, pool_metrics
+from services.password_hashing import password_hasher
+from services.project_deletion import project_deleter
+from services.propagation import propagator
+from services.etag import ETAG_HEADER
+from services.pagination import NEXT_CURSOR_HEADER
+from services.startup import DEFERRED_STEPS, startup
 
 logging.basicConfig(level=logging.INFO)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    # Fast path only, the client connects lazily; the rest is deferred
+    # (services/startup.py) and tracked by GET /readyz
+    fast_path_started = time.perf_counter()
     await connect_to_mongo()
+    # Resumes the rename propagation jobs and project deletions left unfinished
+    propagator.start()
+    project_deleter.start()
+    startup.start(DEFERRED_STEPS)
+    startup.record("fast_path", time.perf_counter() - fast_path_started)
     yield
+    await startup.stop()
+    await project_deleter.stop()
+    await propagator.stop()
+    logging.getLogger("inf3-projet-api").info("MongoDB pool: %s", pool_metrics.stats())
     await close_mongo_connection()
+    password_hasher.shutdown()
 
 app = FastAPI(lifespan=lifespan)
 app.add_middleware(
@@ -22,7 +47,13 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, ETAG_HEADER, DB_CALLS_HEADER, "Server-Timing"],
 )
+# Outermost, so the latency covers the other middlewares
+app.add_middleware(MetricsMiddleware)
 app.router.include_router(auth_router)
 app.router.include_router(project_router)
 app.router.include_router(user_router)
+app.router.include_router(health_router)
+
+startup.record("imports", time.perf_counter() - _imports_started)
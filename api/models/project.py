@@ -32,5 +32,9 @@ class CreateProjectRequest(BaseModel):
     title: str
     description: str
 
+class ProjectUpdate(BaseModel):
+    title: Optional[str] = Field(None, min_length=1)
+    description: Optional[str] = None
+
 class CreateProjectResponse(BaseModel):
     id: str
\ No newline at end of file
@@ -1,7 +1,7 @@
 from models.utils import PyObjectId
 from pydantic import BaseModel, EmailStr, Field
 from datetime import datetime
-from typing import Optional
+from typing import Dict, Literal, Optional, List
 from enum import Enum
 from models.project import ProjectExtendedReference
 
@@ -30,9 +30,44 @@ class Task(BaseModel):
     assigned_to: Optional[TaskUserExtendedReference]
     state: str
     priority: str
-    deadline: datetime
+    deadline: Optional[datetime]
     created_at: datetime
     updated_at: datetime
+
+class ProjectDashboard(BaseModel):
+    """Facets of GET /projects/{id}/dashboard; only the requested ones are set."""
+    total_tasks: Optional[List[dict]] = None
+    state_priority_breakdown: Optional[List[dict]] = None
+    state_distribution: Optional[List[dict]] = None
+    productivity: Optional[List[dict]] = None
+    near_deadline: Optional[List[Task]] = None
+
+class TaskListItem(BaseModel):
+    """Task as returned by list endpoints; only the selected fields are set."""
+    id: PyObjectId = Field(alias="_id")
+    project: Optional[ProjectExtendedReference] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    assigned_to: Optional[TaskUserExtendedReference] = None
+    state: Optional[str] = None
+    priority: Optional[str] = None
+    deadline: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+class TaskSearchResult(Task):
+    """Task matching a search, with its relevance score (best first)."""
+    score: float
+
+class UserTaskSummary(BaseModel):
+    """Counts of the tasks assigned to a user across their projects."""
+    total: int
+    by_state: Dict[str, int]
+    by_priority: Dict[str, int]
+    # Not completed and past their deadline
+    overdue: int
+    overdue_by_priority: Dict[str, int]
+
 class CreateTaskRequest(BaseModel):
     title: str
     description: str
@@ -56,4 +91,40 @@ class TaskUpdate(BaseModel):
                 "priority": "high",
                 "state": "in_progress"
             }
-        }
\ No newline at end of file
+        }
+
+class BulkTaskOperation(BaseModel):
+    """One item of POST /projects/{id}/tasks/bulk."""
+    op: Literal["create", "update", "delete"]
+    task_id: Optional[str] = None
+    create: Optional[CreateTaskRequest] = None
+    update: Optional[TaskUpdate] = None
+
+class BulkTaskRequest(BaseModel):
+    operations: List[BulkTaskOperation] = Field(..., min_length=1)
+    ordered: bool = True
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "ordered": False,
+                "operations": [
+                    {"op": "create", "create": {"title": "Write specs", "description": "", "priority": "HIGH", "deadline": None}},
+                    {"op": "update", "task_id": "60ad8f02c45e88b6f8e4b6e2", "update": {"state": "IN PROGRESS"}},
+                    {"op": "delete", "task_id": "60ad8f02c45e88b6f8e4b6e3"}
+                ]
+            }
+        }
+
+class BulkTaskResult(BaseModel):
+    index: int
+    op: str
+    status: int
+    id: Optional[str] = None
+    detail: Optional[str] = None
+
+class BulkTaskResponse(BaseModel):
+    ordered: bool
+    succeeded: int
+    failed: int
+    results: List[BulkTaskResult]
@@ -44,6 +44,10 @@ class UserDataResponse(BaseModel):
             }
         }
 
+class UserUpdate(BaseModel):
+    first_name: Optional[str] = Field(None, min_length=1)
+    last_name: Optional[str] = Field(None, min_length=1)
+
 class TokenSchema(BaseModel):
     access_token: str
     refresh_token: str
@@ -5,7 +5,8 @@ import logging
 from db import get_database
 from models.user import CreateUserRequest, UserDataResponse, TokenSchema, LoginUserRequest
 from jose import JWTError, jwt
-from services.auth import get_password_hash, get_current_token, verify_password, create_refresh_token, create_access_token, get_current_user, credentials_exception
+from services.auth import get_password_hash, get_current_token, verify_password, create_access_token, get_current_user, credentials_exception, get_principal, invalidate_principal, principal_claims
+from services.refresh_tokens import issue_refresh_token, rotate_refresh_token, revoke_session, revoke_user_sessions
 from config import settings
 from pymongo.errors import DuplicateKeyError
 
@@ -15,7 +16,7 @@ auth_router = APIRouter(prefix="/auth")
 @auth_router.post("/signup", response_model=UserDataResponse, status_code=status.HTTP_201_CREATED)
 async def user_signup(user: CreateUserRequest):
     db = get_database()
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     user_in_db = user.model_dump()
     user_in_db["password"] = hashed_password
     try:
@@ -34,7 +35,7 @@ async def login(form_data: LoginUserRequest):
     db = get_database()
     user = await db["users"].find_one({"email": form_data.email})
     
-    if not user or not verify_password(form_data.password, user["password"]):
+    if not user or not await verify_password(form_data.password, user["password"]):
         logger.warning("Failed login attempt for email: %s", form_data.email)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -42,15 +43,9 @@ async def login(form_data: LoginUserRequest):
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Create access and refresh tokens
-    access_token = create_access_token(data={"sub": user["email"]})
-    refresh_token = create_refresh_token(data={"sub": user["email"]})
-
-    # Hash the refresh token and store it in the database
-    hashed_refresh_token = get_password_hash(refresh_token)
-    await db["users"].update_one(
-        {"_id": user["_id"]}, {"$set": {"hashed_refresh_token": hashed_refresh_token}}
-    )
+    # Create access and refresh tokens; each login opens its own session
+    refresh_token, session_id = await issue_refresh_token(user)
+    access_token = create_access_token(data={**principal_claims(user), "sid": session_id})
     logger.info("User logged in: %s", user["email"])
     return {
         "access_token": access_token,
@@ -60,7 +55,6 @@ async def login(form_data: LoginUserRequest):
 
 @auth_router.get("/refresh", response_model=TokenSchema)
 async def refresh_token(refresh_token: str = Depends(get_current_token)):
-    db = get_database()
     try:
         payload = jwt.decode(refresh_token, settings.secret_key, algorithms=[settings.algorithm])
         email: str = payload.get("sub")
@@ -69,24 +63,16 @@ async def refresh_token(refresh_token: str = Depends(get_current_token)):
     except jwt.JWTError:
         raise credentials_exception
 
-    user = await db["users"].find_one({"email": email})
+    # One indexed lookup: marks the token as used, or revokes the session on reuse
+    stored = await rotate_refresh_token(refresh_token)
 
-    if user is None or user.get("hashed_refresh_token") is None:
+    user = await get_principal(email)
+    if user is None or user["_id"] != stored["user_id"]:
         raise credentials_exception
 
-    # Verify the submitted refresh token against the hashed version in the DB
-    if not verify_password(refresh_token, user["hashed_refresh_token"]):
-        raise credentials_exception
-    
-    # Issue new tokens
-    new_access_token = create_access_token(data={"sub": email})
-    new_refresh_token = create_refresh_token(data={"sub": email})
-
-    # Update the stored refresh token hash
-    new_hashed_refresh_token = get_password_hash(new_refresh_token)
-    await db["users"].update_one(
-        {"_id": user["_id"]}, {"$set": {"hashed_refresh_token": new_hashed_refresh_token}}
-    )
+    # Issue new tokens in the same session
+    new_refresh_token, session_id = await issue_refresh_token(user, session_id=stored["session_id"])
+    new_access_token = create_access_token(data={**principal_claims(user), "sid": session_id})
 
     logger.info("Refresh token rotated for user: %s", email)
 
@@ -97,12 +83,14 @@ async def refresh_token(refresh_token: str = Depends(get_current_token)):
     }
 
 @auth_router.post("/logout", status_code=status.HTTP_204_NO_CONTENT)
-async def logout(current_user: dict = Depends(get_current_user)):
-    db = get_database()
-    # Remove the refresh token from the database to invalidate it
-    await db["users"].update_one(
-        {"_id": current_user["_id"]}, {"$set": {"hashed_refresh_token": None}}
-    )
+async def logout(current_user: dict = Depends(get_current_user), token: str = Depends(get_current_token)):
+    # Revoke the refresh tokens of this session, or of every session for
+    # tokens issued before sessions existed
+    session_id = jwt.get_unverified_claims(token).get("sid")
+    if session_id:
+        await revoke_session(session_id)
+    else:
+        await revoke_user_sessions(current_user["_id"])
+    invalidate_principal(current_user["email"])
     logger.info("User logged out: %s", current_user.get("email"))
     return {"message": "Logout successful"}
-
@@ -0,0 +1,78 @@
+import asyncio
+
+from fastapi import APIRouter, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from db import get_database
+from services.analytics import analytics_cache
+from services.auth import principal_cache
+from services.authorization import membership_cache
+from services.metrics import pool_metrics, render
+from services.password_hashing import password_hasher
+from services.startup import startup
+
+health_router = APIRouter()
+
+#Bound on the MongoDB ping of GET /readyz
+READY_PING_TIMEOUT_SECONDS = 1.0
+
+
+@health_router.get("/healthz")
+async def healthz():
+    """
+    Liveness probe.
+
+    Answers as soon as the worker serves requests, without touching the
+    database. 503 once a deferred startup step has given up retrying, so
+    the worker gets restarted.
+    """
+    if startup.failed:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "failed", "errors": startup.stats()["errors"]},
+        )
+    return {"status": "ok"}
+
+
+@health_router.get("/readyz")
+async def readyz():
+    """
+    Readiness probe.
+
+    200 once the deferred startup steps are done and MongoDB answers a
+    ping, 503 otherwise. The body reports the startup steps and timings,
+    the connection pool and the warm-up state of the caches.
+    """
+    mongo = "ok"
+    try:
+        await asyncio.wait_for(get_database().command("ping"), timeout=READY_PING_TIMEOUT_SECONDS)
+    except Exception as error:
+        mongo = error.__class__.__name__
+    ready = startup.ready and mongo == "ok"
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={
+            "status": "ready" if ready else "starting" if not startup.ready else "degraded",
+            "mongo": mongo,
+            "startup": startup.stats(),
+            "pool": pool_metrics.stats(),
+            "password_hasher": password_hasher.stats(),
+            "caches": {
+                "principals": principal_cache.stats(),
+                "memberships": membership_cache.stats(),
+                "analytics": analytics_cache.stats(),
+            },
+        },
+    )
+
+
+@health_router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+    Metrics in the Prometheus text format.
+
+    HTTP latency and MongoDB command count per route, MongoDB command
+    latency and documents per collection and command, and pool checkout
+    waits (see services/metrics.py).
+    """
+    return PlainTextResponse(render(), media_type="text/plain; version=0.0.4")
@@ -1,13 +1,40 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Query, Request, Response, WebSocket, WebSocketDisconnect, WebSocketException
+from fastapi.responses import StreamingResponse
 import logging
 
 from datetime import datetime
-from db import get_database
-from services.auth import get_current_user
-from pymongo import ReturnDocument
+from typing import Literal, Optional
+from config import settings
+from db import get_analytics_database, get_database
+from services.auth import decode_token, get_current_user, get_current_principal
+from services.authorization import (
+    LIVE_PROJECT, TaskAccess, ensure_project_member, fetch_project_for_user, forget_project, is_live_member, is_project_manager, member_role,
+    project_manager, project_member, remember_project, task_manager, task_reader, task_writer, to_object_id,
+)
+from pymongo import ASCENDING, DeleteOne, InsertOne, ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
+import bson
 from bson import ObjectId
-from models.project import Project, CreateProjectRequest, CreateProjectResponse
-from models.task import Task, CreateTaskRequest, CreateTaskResponse, TaskUpdate
+from models.project import Project, CreateProjectRequest, CreateProjectResponse, ProjectUpdate
+from models.task import (
+    Task, TaskListItem, TaskSearchResult, ProjectDashboard, CreateTaskRequest, CreateTaskResponse, TaskUpdate, TaskState, TaskPriority,
+    BulkTaskOperation, BulkTaskRequest, BulkTaskResponse, BulkTaskResult,
+)
+from services.analytics import DASHBOARD_FACETS, analytics_cache, analytics_now, dashboard_pipeline, near_deadline_stages, project_match
+from services.project_stats import (
+    create_stats, forget_assignee, get_stats, productivity_result, rebuild_stats, record_task_changes,
+    state_distribution_result, state_priority_result, tasks_revision, total_tasks_result, touch_stats,
+)
+from services.etag import ETAG_HEADER, etag_matches, make_etag, not_modified
+from services.events import CLOSED, EVICTED, event_hub
+from services.project_deletion import mark_deleting
+from services.propagation import schedule_propagation
+from services.serialization import documents_response, dumps, model_projection
+from services.export import iter_csv, iter_ndjson
+from services.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_filter, next_cursor
 
 logger = logging.getLogger("inf3-projet-api")
 
@@ -15,207 +42,306 @@ from pydantic import BaseModel
 
 project_router = APIRouter(prefix="/projects")
 
+#Projections matching the response models of the list endpoints
+PROJECT_FIELDS = model_projection(Project)
+TASK_FIELDS = model_projection(Task)
+
 
-async def _fetch_project_for_user(project_id: str, current_user: dict):
+async def _task_written(before: Optional[dict], after: Optional[dict]):
     """
-    Internal helper: return the project document if the current user is
-    either a member or a manager. Raises HTTPException(404) if not found
-    or not accessible.
+    Hook run after every task insert (`before=None`), update or delete
+    (`after=None`) made by this router.
     """
-    try:
-        pid = ObjectId(project_id) if not isinstance(project_id, ObjectId) else project_id
-    except Exception:
-        pid = project_id
-    project = await get_database()["projects"].find_one({
-        "_id": pid,
-        "members._id": current_user["_id"]
-    })
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    await _tasks_written([(before, after)])
+
+
+async def _tasks_written(changes: list) -> set:
+    """
+    `_task_written` for a batch of (before, after) pairs. Returns the IDs
+    of the projects whose statistics had to be rebuilt from their tasks.
+    """
+    # Moves the revision that versions the analytics cache
+    rebuilt = await record_task_changes(changes)
+    if len(changes) == 1:
+        (before, after), = changes
+        project_id = (after or before)["project"]["_id"]
+        if before is None:
+            _publish(project_id, "task.created", task=after)
+        elif after is None:
+            _publish(project_id, "task.deleted", task={"_id": before["_id"]})
+        else:
+            _publish(project_id, "task.updated", task=after)
+        return rebuilt
+    # A batch is one event carrying the IDs: one per task would overflow
+    # the subscribers' queues (events_queue_size) and evict them
+    batches = {}
+    for before, after in changes:
+        project_id = (after or before)["project"]["_id"]
+        batch = batches.setdefault(project_id, {"created": [], "updated": [], "deleted": []})
+        kind = "created" if before is None else "deleted" if after is None else "updated"
+        batch[kind].append((after or before)["_id"])
+    for project_id, batch in batches.items():
+        _publish(project_id, "tasks.bulk", **batch)
+    return rebuilt
+
+
+async def _project_changed(project_id, project: Optional[dict] = None, event: Optional[str] = None, **payload):
+    """
+    Hook run after every membership change (with the updated `project`
+    and the `event` to push to the project's subscribers) or deletion
+    (`project=None`) made by this router.
+    """
+    if project is not None:
+        remember_project(project)
+    else:
+        forget_project(project_id)
+    await analytics_cache.invalidate(project_id)
+    if project is None:
+        _publish(project_id, "project.deleted")
+        event_hub.close_project(project_id)
+    elif event is not None:
+        _publish(project_id, event, **payload)
+
+
+def _publish(project_id, event: str, **payload):
+    # Encoded once here rather than once per subscriber
+    event_hub.publish(project_id, dumps({"type": event, "project_id": project_id, **payload}).decode())
+
+
+def _revised(update: dict) -> dict:
+    """Add the revision bump that every write of a project document makes."""
+    return {**update, "$inc": {"revision": 1}, "$set": {**update.get("$set", {}), "updated_at": datetime.now()}}
+
+
+def _project_etag(project: dict) -> str:
+    return make_etag(project["_id"], project.get("revision", 0), project.get("updated_at") or project.get("created_at"))
+
 
 @project_router.get("/", response_model=list[Project])
-async def get_projects(current_user: dict = Depends(get_current_user)):
+async def get_projects(request: Request, response: Response, current_user: dict = Depends(get_current_principal)):
     """
     Retrieve all projects for the current user.
 
     Returns a list of projects where the current user is either a member
-    or a manager.
-    """
-    return await get_database()["projects"].find({
-        "members._id": current_user["_id"]
-    }).to_list()
+    or a manager. The ETag is built from the projects' revisions only, so
+    an unchanged list is answered with 304 without reading the documents.
+    """
+    query = {"members._id": current_user["_id"], **LIVE_PROJECT}
+    revisions = await get_database()["projects"].find(query, {"revision": 1, "updated_at": 1, "created_at": 1}).to_list()
+    etag = make_etag(*(_project_etag(project) for project in revisions))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+    projects = await get_database()["projects"].find(query, PROJECT_FIELDS).to_list()
+    return documents_response(projects, headers={ETAG_HEADER: etag})
 
 @project_router.get("/{id}", response_model=Project)
-async def get_project(id: str, current_user: dict = Depends(get_current_user)):
+async def get_project(id: str, request: Request, response: Response, current_user: dict = Depends(get_current_principal)):
     """
     Retrieve a single project by ID for the current user.
 
-    Returns the project if the current user is a member or manager.
+    Returns the project if the current user is a member or manager, or 304
+    if it still matches the request's If-None-Match.
     Raises 404 if not found or not accessible.
     """
-    return await _fetch_project_for_user(id, current_user)
+    project = await fetch_project_for_user(id, current_user)
+    etag = _project_etag(project)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+    return project
 
 @project_router.get("/{id}/total-tasks")
-async def get_total_tasks_per_project(id:str, current_user: dict = Depends(get_current_user)):
+async def get_total_tasks_per_project(id:str, current_user: dict = Depends(get_current_principal)):
     """
     Return the total number of tasks for the specified project.
 
-    Verifies the current user has access to the project and then
-    runs an aggregation on the `tasks` collection to count tasks
-    that reference the given project ID.
+    Verifies the current user has access to the project and then reads
+    the count from the project's materialized statistics.
     """
-    await _fetch_project_for_user(id, current_user)
-    
-    pipeline = [
-        {"$match": {"project._id": ObjectId(id)}},
-        {"$count": "total_tasks"}
-    ]
-    return await get_database()["tasks"].aggregate(pipeline).to_list(None)
+    project_id = await ensure_project_member(id, current_user)
+    return total_tasks_result(await get_stats(project_id))
 
 @project_router.get("/{id}/tasks-state-priority-breakdown")
-async def get_tasks_by_state_priority(id:str, current_user: dict = Depends(get_current_user)):
+async def get_tasks_by_state_priority(id:str, current_user: dict = Depends(get_current_principal)):
     """
     Provide a breakdown of tasks grouped by state and priority.
 
-    Ensures the user can access the project, then groups tasks
-    by their `state` and `priority` and returns counts.
+    Ensures the user can access the project, then returns the task
+    counts per (`state`, `priority`) from the materialized statistics.
     """
-    await _fetch_project_for_user(id, current_user)
-    
-    pipeline = [
-        {"$match": {"project._id": ObjectId(id)}},
-        {   
-            "$group": {
-                "_id": {
-                    "state": "$state",
-                    "priority": "$priority"
-                },
-                "number_task": {"$sum": 1}
-            }
-        }
-    ]
-    return await get_database()["tasks"].aggregate(pipeline).to_list(length=None)
+    project_id = await ensure_project_member(id, current_user)
+    return state_priority_result(await get_stats(project_id))
 
 
 @project_router.get("/{id}/tasks-productivity")
-async def get_top_productive_users(id:str,limit:int = 5,  current_user: dict = Depends(get_current_user)):
+async def get_top_productive_users(id:str,limit:int = 5,  current_user: dict = Depends(get_current_principal)):
     """
     Return the top N users by number of completed tasks in the project.
 
-    Validates access, filters tasks in state "COMPLETED", groups by
-    the assignee and returns the top `limit` results sorted by count.
-    """
-    await _fetch_project_for_user(id, current_user)
-    pipeline = [
-        {
-            "$match": {
-                "project._id": ObjectId(id),
-                "state": "COMPLETED",
-                "assigned_to._id": {"$exists": True}
-            }
-        },
-        {
-            "$group": {
-                "_id": {
-                    "user_id": {"$toString": "$assigned_to._id"},
-                    "first_name": "$assigned_to.first_name"
-                },
-                "tasks_completed": {"$sum": 1}
-            }
-        },
-        {
-            "$project":{
-                "_id":0,
-                "first_name":"$_id.first_name",
-                "tasks_completed": 1
-            }
-        },
-        {"$sort": {"tasks_completed": -1}},
-        {"$limit": limit}
-    ]
-    return await get_database()["tasks"].aggregate(pipeline).to_list(length=None)
+    Validates access, then returns the top `limit` assignees by number of
+    "COMPLETED" tasks from the materialized statistics.
+    """
+    project_id = await ensure_project_member(id, current_user)
+    return productivity_result(await get_stats(project_id), limit)
 
 @project_router.get("/{id}/tasks-state-distribution")
-async def get_task_state_distribution(id:str,  current_user: dict = Depends(get_current_user)):
+async def get_task_state_distribution(id:str,  current_user: dict = Depends(get_current_principal)):
     """
     Compute the distribution of task states for the project.
 
-    After access validation, aggregates counts per task state and computes
-    the percentage share of each state relative to the project's total tasks.
+    After access validation, reads the counts per task state from the
+    materialized statistics and computes the percentage share of each
+    state relative to the project's total tasks.
     """
-    await _fetch_project_for_user(id, current_user)
-    
-    pipeline = [
-        {"$match": {"project._id": ObjectId(id)}},
-
-        {
-            "$group": {
-                "_id": "$state",
-                "nb_of_tasks": {"$sum": 1}
-            }
-        },
-        {
-            "$group": {
-                "_id": None,
-                "total_task_count": {"$sum": "$nb_of_tasks"},
-                "states": {
-                    "$push": {
-                        "state": "$_id",
-                        "nb_of_tasks": "$nb_of_tasks"
-                    }
-                }
-            }
-        },
-        {"$unwind": "$states"},
-        {
-            "$project": {
-                "_id": 0,
-                "state": "$states.state",
-                "nb_of_tasks": "$states.nb_of_tasks",
-                "percentage": {
-                    "$multiply": [
-                        { "$divide": ["$states.nb_of_tasks", "$total_task_count"] },
-                        100
-                    ]
-                }
-            }
-        }
-    ]
-    return await get_database()["tasks"].aggregate(pipeline).to_list(length=None)
+    project_id = await ensure_project_member(id, current_user)
+    return state_distribution_result(await get_stats(project_id))
 
-@project_router.get("/{id}/near-deadline")
-async def get_tasks_near_deadline(id: str, inXDays:int = 3, current_user: dict = Depends(get_current_user)):
+@project_router.get("/{id}/near-deadline", response_model=list[Task])
+async def get_tasks_near_deadline(id: str, inXDays:int = 3, current_user: dict = Depends(get_current_principal)):
     """
-    Get tasks whose deadline is within the next 3 days and not completed
+    Get tasks whose deadline is within the next `inXDays` days and not completed
     """
-    await _fetch_project_for_user(id, current_user)
-
-    from datetime import datetime, timedelta
-    now = datetime.now()
-    in_X_days = now + timedelta(days=inXDays)
+    project_id = await ensure_project_member(id, current_user)
 
-    pipeline = [
-        {
-            "$match": {
-                "project._id": ObjectId(id),
-                "state": { "$ne": "COMPLETED" },
-                "deadline": { "$gte": now, "$lte": in_X_days }
-            }
-        },
-        {
-            "$sort": { "deadline": 1 }
-        }
+    now = analytics_now()
+    pipeline = [project_match(project_id)] + near_deadline_stages(inXDays, now) + [{"$project": TASK_FIELDS}]
+    tasks = await analytics_cache.get_or_compute(
+        "near-deadline", project_id, {"inXDays": inXDays, "now": now},
+        lambda: get_analytics_database()["tasks"].aggregate(pipeline).to_list(length=None)
+    )
+    return documents_response(tasks)
+
+@project_router.get("/{id}/dashboard", response_model=ProjectDashboard, response_model_exclude_unset=True)
+async def get_project_dashboard(
+    id: str,
+    include: Optional[str] = Query(None, description="Comma separated facets to compute; all of them by default"),
+    limit: int = 5,
+    inXDays: int = 3,
+    current_user: dict = Depends(get_current_principal)
+):
+    """
+    Return every analytics block of the project page in one call.
+
+    After a single access check, the counting facets (`total_tasks`,
+    `state_priority_breakdown`, `state_distribution`, `productivity`)
+    are read from the materialized statistics and `near_deadline` is
+    computed by one aggregation. Each facet has the same shape as the
+    corresponding standalone endpoint; `limit` and `inXDays` are passed
+    to the productivity and near-deadline facets.
+    """
+    project_id = await ensure_project_member(id, current_user)
+
+    # An empty list (e.g. `include=,`) means all facets, like no `include`
+    facets = tuple(f.strip() for f in (include or "").split(",") if f.strip()) or DASHBOARD_FACETS
+    unknown = set(facets) - set(DASHBOARD_FACETS)
+    if unknown:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown dashboard facets: {', '.join(sorted(unknown))}")
+
+    dashboard = {}
+    stats_readers = {
+        "total_tasks": total_tasks_result,
+        "state_priority_breakdown": state_priority_result,
+        "state_distribution": state_distribution_result,
+        "productivity": lambda stats: productivity_result(stats, limit),
+    }
+    if any(name in stats_readers for name in facets):
+        stats = await get_stats(project_id)
+        for name in facets:
+            if name in stats_readers:
+                dashboard[name] = stats_readers[name](stats)
+    # Whatever isn't materialized is computed in one $facet aggregation
+    aggregated = [name for name in facets if name not in stats_readers]
+    if aggregated:
+        now = analytics_now()
+        pipeline = dashboard_pipeline(project_id, aggregated, productivity_limit=limit, in_x_days=inXDays, now=now)
+        result = await analytics_cache.get_or_compute(
+            "dashboard", project_id, {"facets": tuple(aggregated), "limit": limit, "inXDays": inXDays, "now": now},
+            lambda: get_analytics_database()["tasks"].aggregate(pipeline).to_list(length=1)
+        )
+        dashboard.update(result[0] if result else {name: [] for name in aggregated})
+    return dashboard
+
+@project_router.websocket("/{id}/events")
+async def project_events(websocket: WebSocket, id: str, token: str = Query(...)):
+    """
+    Push channel of a project's task and membership events.
+
+    Browsers can't set headers on a WebSocket, so the access token is
+    passed as the `token` query parameter. It is checked the same way as
+    `get_current_user`, together with the project membership, before the
+    connection is accepted. Each message is a JSON object such as
+    `{"type": "task.updated", "project_id": ..., "task": {...}}` (a bulk
+    request sends one `tasks.bulk` event with `created`, `updated` and
+    `deleted` task IDs instead); the connection is closed when the user
+    leaves the project, when the
+    project is deleted, or with code 1013 when the client falls more than
+    `events_queue_size` events behind. It is closed with code 1008 when
+    the token expires, or when a check every `events_access_check_seconds`
+    finds the user no longer a member (a change made by another worker).
+    """
+    try:
+        expires_at = decode_token(token)["exp"]
+        user = await get_current_user(token)
+        project_id = await ensure_project_member(id, user)
+    except HTTPException:
+        raise WebSocketException(code=status.WS_1008_POLICY_VIOLATION)
+
+    await websocket.accept()
+    subscription = event_hub.subscribe(project_id, user["_id"])
+
+    async def send_events():
+        try:
+            while True:
+                event = await subscription.next()
+                if event is EVICTED:
+                    await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER)
+                    return
+                if event is CLOSED:
+                    await websocket.close()
+                    return
+                await websocket.send_text(event)
+        except WebSocketDisconnect:
+            return
+
+    async def wait_for_disconnect():
+        # Clients don't send anything; this notices a closed connection
+        # even when no event is being sent
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+    async def check_access():
+        while True:
+            remaining = expires_at - time.time()
+            if remaining <= 0:
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Token expired")
+                return
+            await asyncio.sleep(min(remaining, settings.events_access_check_seconds))
+            if time.time() < expires_at and not await is_live_member(project_id, user["_id"]):
+                await websocket.close(code=status.WS_1008_POLICY_VIOLATION, reason="Not a project member")
+                return
+
+    tasks = [
+        asyncio.create_task(send_events()),
+        asyncio.create_task(wait_for_disconnect()),
+        asyncio.create_task(check_access()),
     ]
-
-    return await get_database()["tasks"].aggregate(pipeline).to_list(length=None)
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        subscription.close()
 
 @project_router.post("/", response_model=CreateProjectResponse, status_code=status.HTTP_201_CREATED)
 async def create_project(project: CreateProjectRequest, current_user: dict = Depends(get_current_user)):
     """
     Create a new project with the current user as its initial manager.
 
-    Inserts a project document and returns the newly created project's ID.
+    Inserts a project document and its empty statistics, and returns the
+    newly created project's ID.
     """
     project_doc = {
         "title": project.title,
@@ -227,78 +353,119 @@ async def create_project(project: CreateProjectRequest, current_user: dict = Dep
             "email": current_user["email"],
             "role": "manager"
         }],
-        "created_at": datetime.now()
+        "created_at": datetime.now(),
+        "revision": 1,
     }
+    project_doc["updated_at"] = project_doc["created_at"]
     result = await get_database()["projects"].insert_one(project_doc)
+    # Before the ID is returned, so before any task of the project exists
+    await create_stats(result.inserted_id)
+    await _project_changed(result.inserted_id, project_doc)
     logger.info(f"Created project '{project.title}'")
     return CreateProjectResponse(id=str(result.inserted_id))
 
-async def is_project_manager(project_id: str, user_id: str):
+@project_router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_project(id: str, current_user: dict = Depends(get_current_user)):
     """
-    Helper to verify whether a user is a manager for a given project.
+    Delete a project (manager-only action).
 
-    Expects `project_id` and `user_id` to be ObjectId-compatible. Raises
-    404 if the project isn't found or the user isn't a manager. Returns
-    the project document on success.
+    Marks the project as being deleted, which hides it at once, in one
+    conditional update on the current user being a manager; its tasks and
+    the project document are then removed in the background by
+    `project_deleter`. Returns no content on success.
     """
-    try:
-        pid = ObjectId(project_id) if not isinstance(project_id, ObjectId) else project_id
-    except Exception:
-        pid = project_id
-    try:
-        uid = ObjectId(user_id) if not isinstance(user_id, ObjectId) else user_id
-    except Exception:
-        uid = user_id
-    project = await get_database()["projects"].find_one({
-        "_id": pid,
-        "members": {"$elemMatch": {"_id": uid, "role": "manager"}}
+    project = await mark_deleting({
+        "_id": to_object_id(id),
+        "members": {"$elemMatch": {"_id": current_user["_id"], "role": "manager"}},
     })
-    if not project:
+    if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
-    return project
+    await _project_changed(project["_id"])
+    logger.info(f"Scheduled deletion of project '{project['title']}'")
+    return
 
-@project_router.delete("/{id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_project(id: str, current_user: dict = Depends(get_current_user)):
+@project_router.patch("/{id}", response_model=Project)
+async def update_project(id: str, update: ProjectUpdate, current_user: dict = Depends(get_current_user)):
     """
-    Delete a project (manager-only action).
+    Update a project's title and/or description (manager-only).
 
-    Confirms the current user is a project manager and deletes the
-    project document. Returns no content on success.
+    A new title is copied into the project's tasks by a background
+    propagation job. Returns the updated project document.
     """
+    project = await is_project_manager(to_object_id(id), current_user["_id"])
+    fields = update.model_dump(exclude_unset=True, exclude_none=True)
+    if not fields:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Request body cannot be empty.")
+    updated = await get_database()["projects"].find_one_and_update(
+        {"_id": project["_id"], **LIVE_PROJECT},
+        _revised({"$set": fields}),
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    await _project_changed(project["_id"], updated, "project.updated", title=updated["title"], description=updated["description"])
+    if fields.get("title", project["title"]) != project["title"]:
+        await schedule_propagation("project", project["_id"])
+    logger.info(f"Updated project '{updated['title']}'")
+    return updated
 
-    project = await is_project_manager(ObjectId(id), current_user["_id"])
-    deleted_tasks_result = await get_database()["tasks"].delete_many({"project._id": project["_id"]})
-    await get_database()["projects"].delete_one({"_id": project["_id"]})
-    logger.info(f"Deleted project '{project['title']}' and {deleted_tasks_result.deleted_count} tasks")
-    return
+async def _update_membership(id: str, current_user: dict, condition: dict, update: dict, failure, array_filters: Optional[list] = None) -> dict:
+    """
+    Apply `update` to the project in one conditional `find_one_and_update`
+    matching only if the current user manages the project and `condition`
+    holds, so the checks and the write are atomic. When nothing matched,
+    the project is read once to report which check failed: 404 if the
+    user doesn't manage it, otherwise 400 with `failure(project)`.
+    """
+    project_id = to_object_id(id)
+    updated = await get_database()["projects"].find_one_and_update(
+        {"_id": project_id, **LIVE_PROJECT, "$and": [
+            {"members": {"$elemMatch": {"_id": current_user["_id"], "role": "manager"}}},
+            condition,
+        ]},
+        _revised(update),
+        array_filters=array_filters,
+        return_document=ReturnDocument.AFTER
+    )
+    if updated is not None:
+        return updated
+    project = await get_database()["projects"].find_one({"_id": project_id, **LIVE_PROJECT}, {"members": 1})
+    if project is None or member_role(project, current_user["_id"]) != "manager":
+        forget_project(project_id)
+        raise HTTPException(status_code=404, detail="Project not found")
+    raise HTTPException(status_code=400, detail=failure(project))
+
+async def _find_user(email: str) -> dict:
+    user = await get_database()["users"].find_one({"email": email})
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
 
 @project_router.post("/{id}/members/{user_email}", response_model=Project)
 async def add_project_member(id: str, user_email: str, current_user: dict = Depends(get_current_user)):
     """
     Add a user as a project member by email (manager-only).
 
-    Verifies manager privileges, checks the target user exists and isn't
-    already part of the project, then adds them to the `members` array.
-    Returns the project document.
+    Checks the target user exists, then adds them to the `members` array
+    in one conditional update that also verifies the manager privileges
+    and that they aren't already part of the project, so concurrent adds
+    can't create duplicates. Returns the project document.
     """
-    project = await is_project_manager(ObjectId(id), current_user["_id"])
-    user = await get_database()["users"].find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if any(member["_id"] == user["_id"] for member in project.get("members", [])):
-        raise HTTPException(status_code=400, detail="User is already a member of the project")
-    updated = await get_database()["projects"].find_one_and_update(
-        {"_id": project["_id"]},
-        {"$addToSet": {"members": {
+    user = await _find_user(user_email)
+    updated = await _update_membership(
+        id, current_user,
+        {"members._id": {"$ne": user["_id"]}},
+        {"$push": {"members": {
             "_id": user["_id"],
             "first_name": user["first_name"],
             "last_name": user["last_name"],
             "email": user["email"],
             "role": "member"
         }}},
-        return_document=ReturnDocument.AFTER
+        failure=lambda project: "User is already a member of the project"
     )
-    logger.info(f"Added user '{user['first_name']} {user['last_name']}' to project '{project['title']}'")
+    await _project_changed(updated["_id"], updated, "member.added", user_id=user["_id"])
+    logger.info(f"Added user '{user['first_name']} {user['last_name']}' to project '{updated['title']}'")
     return updated
 
 @project_router.delete("/{id}/members/{user_email}", response_model=Project)
@@ -306,27 +473,27 @@ async def remove_project_member(id: str, user_email: str, current_user: dict = D
     """
     Remove a user from the project's members list (manager-only).
 
-    Ensures the acting user is a manager, confirms the specified email is
-    currently a member, and removes them from the `members` array.
-    Returns the project document.
+    Removes them from the `members` array in one conditional update that
+    also verifies the manager privileges and the membership, then
+    unassigns their tasks in the project. Returns the project document.
     """
-    project = await is_project_manager(ObjectId(id), current_user["_id"])
-    user = await get_database()["users"].find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if not any(member["email"] == user_email for member in project.get("members", [])):
-        raise HTTPException(status_code=400, detail="User is not a member of the project")
-    await get_database()["tasks"].update_many(
-        {"project._id": project["_id"], "assigned_to._id": user["_id"]},
-        {"$set": {"assigned_to": None}}
+    user = await _find_user(user_email)
+    updated = await _update_membership(
+        id, current_user,
+        {"members._id": user["_id"]},
+        {"$pull": {"members": {"_id": user["_id"]}}},
+        failure=lambda project: "User is not a member of the project"
     )
-
-    updated = await get_database()["projects"].find_one_and_update(
-        {"_id": project["_id"]},
-        {"$pull": {"members": {"email": user_email}}},
-        return_document=ReturnDocument.AFTER
+    project_id = updated["_id"]
+    await get_database()["tasks"].update_many(
+        {"project._id": project_id, "assigned_to._id": user["_id"]},
+        {"$set": {"assigned_to": None, "updated_at": datetime.now()}}
     )
-    logger.info(f"Removed user '{user_email}' from project '{project['title']}' and unassigned their tasks in the project")
+    await forget_assignee(project_id, user["_id"])
+    await touch_stats(project_id)
+    await _project_changed(project_id, updated, "member.removed", user_id=user["_id"])
+    event_hub.close_project(project_id, user["_id"])
+    logger.info(f"Removed user '{user_email}' from project '{updated['title']}' and unassigned their tasks in the project")
     return updated
 
 @project_router.delete("/{id}/managers/{user_email}", response_model=Project)
@@ -334,25 +501,21 @@ async def remove_project_manager(id: str, user_email: str, current_user: dict =
     """
     Demote a project manager to a regular member.
 
-    Confirms the acting user is a manager, verifies the target user exists
-    and is currently a manager, then moves them from `managers` to
-    the `members` array.
+    Checks the target user exists, then changes their role in one
+    conditional update that also verifies the acting user's manager
+    privileges and that the target is currently a manager.
     Returns the project document.
     """
-    project = await is_project_manager(ObjectId(id), current_user["_id"])
-    user = await get_database()["users"].find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-
-    if not any(m.get("_id") == user["_id"] and m.get("role") == "manager" for m in project.get("members", [])):
-        raise HTTPException(status_code=400, detail="User is not a manager of the project")
-
-    await get_database()["projects"].update_one(
-        {"_id": project["_id"], "members._id": user["_id"]},
-        {"$set": {"members.$.role": "member"}}
+    user = await _find_user(user_email)
+    updated = await _update_membership(
+        id, current_user,
+        {"members": {"$elemMatch": {"_id": user["_id"], "role": "manager"}}},
+        {"$set": {"members.$[target].role": "member"}},
+        failure=lambda project: "User is not a manager of the project",
+        array_filters=[{"target._id": user["_id"]}]
     )
-    updated = await get_database()["projects"].find_one({"_id": project["_id"]})
-    logger.info(f"Demoted user '{user_email}' to member in project '{project['title']}'")
+    await _project_changed(updated["_id"], updated, "member.role_changed", user_id=user["_id"], role="member")
+    logger.info(f"Demoted user '{user_email}' to member in project '{updated['title']}'")
     return updated
 
 @project_router.post("/{id}/managers/{user_email}", response_model=Project)
@@ -360,39 +523,29 @@ async def add_project_manager(id: str, user_email: str, current_user: dict = Dep
     """
     Promote a project member to manager (manager-only).
 
-    Ensures the target user exists and is currently a member, then moves
-    them from `members` to `managers`. Returns the project document.
+    Checks the target user exists, then changes their role in one
+    conditional update that also verifies the acting user's manager
+    privileges and that the target is a member but not yet a manager.
+    Returns the project document.
     """
-    project = await is_project_manager(ObjectId(id), current_user["_id"])
-    user = await get_database()["users"].find_one({"email": user_email})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    if any(m.get("_id") == user["_id"] and m.get("role") == "manager" for m in project.get("members", [])):
-        raise HTTPException(status_code=400, detail="User is already a manager of the project")
-    if not any(m.get("_id") == user["_id"] for m in project.get("members", [])):
-        raise HTTPException(status_code=400, detail="User isn't already a member of the project")
-
-    await get_database()["projects"].update_one(
-        {"_id": project["_id"], "members._id": user["_id"]},
-        {"$set": {"members.$.role": "manager"}}
+    user = await _find_user(user_email)
+    updated = await _update_membership(
+        id, current_user,
+        {"members": {"$elemMatch": {"_id": user["_id"], "role": {"$ne": "manager"}}}},
+        {"$set": {"members.$[target].role": "manager"}},
+        failure=lambda project: (
+            "User isn't already a member of the project" if member_role(project, user["_id"]) is None
+            else "User is already a manager of the project"
+        ),
+        array_filters=[{"target._id": user["_id"]}]
     )
-    updated = await get_database()["projects"].find_one({"_id": project["_id"]})
-    logger.info(f"Promoted user '{user['first_name']} {user['last_name']}' to manager in project '{project['title']}'")
+    await _project_changed(updated["_id"], updated, "member.role_changed", user_id=user["_id"], role="manager")
+    logger.info(f"Promoted user '{user['first_name']} {user['last_name']}' to manager in project '{updated['title']}'")
     return updated
 
     
-@project_router.post("/{id}/tasks/", response_model=CreateTaskResponse, status_code=status.HTTP_201_CREATED)
-async def create_task(id: str, task: CreateTaskRequest, current_user: dict = Depends(get_current_user)):
-    """
-    Create a new task under the specified project (manager-only).
-
-    Validates that the current user is a manager, constructs a task
-    document with default fields and inserts it into the `tasks`
-    collection. Returns the new task's ID.
-    """
-    project = await is_project_manager(ObjectId(id), current_user["_id"])
-
-    task_doc = {
+def _new_task_doc(project: dict, task: CreateTaskRequest) -> dict:
+    return {
         "title": task.title,
         "description": task.description,
         "project": {
@@ -406,45 +559,29 @@ async def create_task(id: str, task: CreateTaskRequest, current_user: dict = Dep
         "created_at": datetime.now(),
         "updated_at": datetime.now()
     }
+
+@project_router.post("/{id}/tasks/", response_model=CreateTaskResponse, status_code=status.HTTP_201_CREATED)
+async def create_task(id: str, task: CreateTaskRequest, project: dict = Depends(project_manager)):
+    """
+    Create a new task under the specified project (manager-only).
+
+    Validates that the current user is a manager, constructs a task
+    document with default fields and inserts it into the `tasks`
+    collection. Returns the new task's ID.
+    """
+    task_doc = _new_task_doc(project, task)
     result = await get_database()["tasks"].insert_one(task_doc)
+    await _task_written(None, task_doc)
     logger.info(f"Created task '{task.title}'")
     return CreateTaskResponse(id=str(result.inserted_id))
 
-@project_router.patch("/{project_id}/tasks/{task_id}", response_model=Task)
-async def update_task(
-    project_id: str,
-    task_id: str,
-    update_data: TaskUpdate,
-    current_user = Depends(get_current_user)
-):
+def _task_update_doc(task: dict, role: Optional[str], current_user: dict, update_data: TaskUpdate) -> dict:
     """
-    Update a task's fields with role-based permissions.
-
-    - Project managers may update title, description, priority, assigned_to,
-        deadline and state.
-    - The assigned user may update the task's `state`, but they are not
-        allowed to mark a task as `COMPLETED` (managers must do that).
-
-    The function validates IDs, permission, and normalizes payloads
-    before performing an atomic update and returning the updated task.
+    Build the `$set` document of an update of `task` by `current_user`
+    (whose project role is `role`), applying the per-field permission
+    rules of `update_task`. Raises HTTPException (400/403).
     """
-    db = get_database()
-    if not ObjectId.is_valid(task_id):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid task ID format.")
-
-    task = await db["tasks"].find_one({"_id": ObjectId(task_id)})
-    if not task:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found.")
-    
-    if task["project"]["_id"] != ObjectId(project_id):
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Task does not belong to the specified project.")
-    
-    project = await db["projects"].find_one({"_id": task["project"]["_id"]})
-    
-    if not project:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Associated project not found.")
-
-    is_manager = any(m.get("_id") == current_user["_id"] and m.get("role") == "manager" for m in project.get("members", []))
+    is_manager = role == "manager"
     assigned_to = task.get("assigned_to")
     assigned_id = None
     if isinstance(assigned_to, dict):
@@ -483,8 +620,7 @@ async def update_task(
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You are not authorized to change this task's state.")
         
         elif field in ["title", "description", "priority", "assigned_to", "deadline"]:
-            logger = logging.getLogger("inf3-projet-api")
-            logger.info(f"Updating task {task_id} field '{field}' to {value}")
+            logger.info(f"Updating task {task['_id']} field '{field}' to {value}")
             if not is_manager:
                 raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Only a project manager can update the task's {field}.")
             update_doc[field] = value if not isinstance(value, BaseModel) else value.model_dump()
@@ -495,59 +631,379 @@ async def update_task(
     if not update_doc:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="You do not have permission to modify any of the requested fields.")
     update_doc["updated_at"] = datetime.now()
-    updated_task = await db["tasks"].find_one_and_update(
-        {"_id": ObjectId(task_id)},
+    # Normalize to exactly what Mongo stores (plain strings, UTC, ms precision)
+    update_doc = bson.decode(bson.encode(update_doc))
+    return update_doc
+
+@project_router.patch("/{project_id}/tasks/{task_id}", response_model=Task)
+async def update_task(
+    project_id: str,
+    task_id: str,
+    update_data: TaskUpdate,
+    current_user = Depends(get_current_user),
+    access: TaskAccess = Depends(task_writer)
+):
+    """
+    Update a task's fields with role-based permissions.
+
+    - Project managers may update title, description, priority, assigned_to,
+        deadline and state.
+    - The assigned user may update the task's `state`, but they are not
+        allowed to mark a task as `COMPLETED` (managers must do that).
+
+    Membership, role and the task are resolved in one round-trip by the
+    `task_writer` dependency; the function then normalizes payloads
+    before performing an atomic update and returning the updated task.
+    """
+    update_doc = _task_update_doc(access.task, access.role, current_user, update_data)
+    # The pre-image is returned atomically so the statistics see exactly
+    # what changed; the new version is the pre-image with the update applied
+    previous_task = await get_database()["tasks"].find_one_and_update(
+        {"_id": access.task["_id"]},
         {"$set": update_doc},
-        return_document=ReturnDocument.AFTER
+        return_document=ReturnDocument.BEFORE
     )
+    if previous_task is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    updated_task = {**previous_task, **update_doc}
+    await _task_written(previous_task, updated_task)
     return updated_task
 
-@project_router.get("/{id}/tasks/", response_model=list[Task])
-async def get_project_tasks(id: str, current_user: dict = Depends(get_current_user)):
+_BULK_SUCCESS_STATUS = {"create": status.HTTP_201_CREATED, "update": status.HTTP_200_OK, "delete": status.HTTP_204_NO_CONTENT}
+
+
+def _plan_bulk_operation(operation: BulkTaskOperation, project: dict, role: Optional[str], current_user: dict, tasks: dict, seen: set) -> tuple:
     """
-    List all tasks for a given project the current user can access.
+    Validate one bulk operation against the same rules as the single-task
+    routes. Returns the (write, before, after) it amounts to; raises
+    HTTPException otherwise.
+    """
+    if operation.op == "create":
+        if role != "manager":
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only a project manager can create tasks.")
+        if operation.create is None:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="`create` is required for create operations.")
+        task_doc = _new_task_doc(project, operation.create)
+        task_doc["_id"] = ObjectId()
+        return InsertOne(task_doc), None, task_doc
 
-    Ensures the user is a member or manager of the project and returns
-    all tasks referencing the project's ID.
+    if not operation.task_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"`task_id` is required for {operation.op} operations.")
+    if not ObjectId.is_valid(operation.task_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid task ID format.")
+    task = tasks.get(ObjectId(operation.task_id))
+    if task is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Task not found")
+    # The pre-images are read once, before the batch: a second operation
+    # on the same task would be checked against a stale version
+    if task["_id"] in seen:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Task appears more than once in the batch.")
+    seen.add(task["_id"])
+
+    # Only applied to the version that was read and checked; a task
+    # changed since then is reported as 409 (see `_stale_bulk_writes`)
+    unchanged = {"_id": task["_id"], "updated_at": task.get("updated_at")}
+    if operation.op == "delete":
+        if role != "manager":
+            raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Only a project manager can delete tasks.")
+        return DeleteOne(unchanged), task, None
+
+    if operation.update is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="`update` is required for update operations.")
+    update_doc = _task_update_doc(task, role, current_user, operation.update)
+    return UpdateOne(unchanged, {"$set": update_doc}), task, {**task, **update_doc}
+
+async def _stale_bulk_writes(applied: list) -> set:
+    """
+    Positions, among the (position, index, before, after) bulk writes that
+    raised no error, of the updates and deletes that matched nothing
+    because their task changed or was deleted after it was read: the task
+    is read again and compared with the version the write would have left.
+    """
+    targets = {before["_id"]: (position, after) for position, _, before, after in applied if before is not None}
+    current = {
+        task["_id"]: task.get("updated_at")
+        async for task in get_database()["tasks"].find({"_id": {"$in": list(targets)}}, {"updated_at": 1})
+    }
+    stale = set()
+    for task_id, (position, after) in targets.items():
+        if after is None:
+            # Gone either way when missing: deleted by this or another request
+            if task_id in current:
+                stale.add(position)
+        elif task_id not in current or current[task_id] != after["updated_at"]:
+            stale.add(position)
+    return stale
+
+@project_router.post("/{id}/tasks/bulk", response_model=BulkTaskResponse)
+async def bulk_tasks(id: str, batch: BulkTaskRequest, current_user: dict = Depends(get_current_user)):
+    """
+    Create, update and delete many tasks of a project in one request.
+
+    The user's role and every referenced task are loaded once, each
+    operation is checked with the same rules as `create_task`,
+    `update_task` and `delete_task`, and the valid ones are applied with a
+    single `bulk_write`. With `ordered` (the default) processing stops at
+    the first failing operation and the following ones are reported as
+    424; otherwise every valid operation is applied. An update or delete
+    only applies to the version of the task that was checked: if another
+    request changed the task in between it is reported as 409 (the
+    following operations are applied nonetheless). Subscribers get a
+    single `tasks.bulk` event with the created, updated and deleted IDs.
+    The response holds one result per operation, in request order.
+    """
+    if len(batch.operations) > settings.bulk_max_operations:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.bulk_max_operations} operations per request."
+        )
+    db = get_database()
+    project = await fetch_project_for_user(id, current_user)
+    role = member_role(project, current_user["_id"])
+
+    task_ids = [ObjectId(op.task_id) for op in batch.operations if op.task_id and ObjectId.is_valid(op.task_id)]
+    tasks = {}
+    if task_ids:
+        async for task in db["tasks"].find({"_id": {"$in": task_ids}, "project._id": project["_id"]}):
+            tasks[task["_id"]] = task
+
+    results: list[Optional[BulkTaskResult]] = [None] * len(batch.operations)
+    planned = []  # (operation index, write, before, after)
+    seen = set()
+    for index, operation in enumerate(batch.operations):
+        try:
+            write, before, after = _plan_bulk_operation(operation, project, role, current_user, tasks, seen)
+        except HTTPException as exc:
+            results[index] = BulkTaskResult(index=index, op=operation.op, status=exc.status_code, detail=exc.detail)
+            if batch.ordered:
+                break
+            continue
+        planned.append((index, write, before, after))
+
+    write_errors = {}
+    matched = deleted = 0
+    if planned:
+        try:
+            write_result = await db["tasks"].bulk_write([write for _, write, _, _ in planned], ordered=batch.ordered)
+            matched, deleted = write_result.matched_count, write_result.deleted_count
+        except BulkWriteError as exc:
+            # `index` is the position in the list of writes
+            write_errors = {error["index"]: error for error in exc.details.get("writeErrors", [])}
+            matched, deleted = exc.details.get("nMatched", 0), exc.details.get("nRemoved", 0)
+
+    first_error = min(write_errors, default=None)
+    applied = []  # (position, index, before, after)
+    for position, (index, write, before, after) in enumerate(planned):
+        operation = batch.operations[index]
+        if position in write_errors:
+            error = write_errors[position]
+            code = status.HTTP_409_CONFLICT if error.get("code") == 11000 else status.HTTP_400_BAD_REQUEST
+            results[index] = BulkTaskResult(
+                index=index, op=operation.op, status=code, id=str((after or before)["_id"]), detail=error.get("errmsg")
+            )
+        elif batch.ordered and first_error is not None and position > first_error:
+            continue  # not applied, reported as 424 below
+        else:
+            applied.append((position, index, before, after))
+
+    updates = sum(1 for _, _, before, after in applied if before is not None and after is not None)
+    deletes = sum(1 for _, _, before, after in applied if after is None)
+    missed = matched < updates or deleted < deletes
+    stale = await _stale_bulk_writes(applied) if missed else set()
+    changes = []
+    for position, index, before, after in applied:
+        operation = batch.operations[index]
+        task_id = str((after or before)["_id"])
+        if position in stale:
+            results[index] = BulkTaskResult(
+                index=index, op=operation.op, status=status.HTTP_409_CONFLICT, id=task_id,
+                detail="The task was changed by another request since it was read."
+            )
+        else:
+            results[index] = BulkTaskResult(index=index, op=operation.op, status=_BULK_SUCCESS_STATUS[operation.op], id=task_id)
+            changes.append((before, after))
+
+    for index, result in enumerate(results):
+        if result is None:
+            results[index] = BulkTaskResult(
+                index=index, op=batch.operations[index].op, status=status.HTTP_424_FAILED_DEPENDENCY,
+                detail="Not applied: an earlier operation failed."
+            )
+
+    rebuilt = await _tasks_written(changes) if changes else set()
+    # A missed write means another request changed these tasks meanwhile:
+    # a task it deleted is also counted as deleted here, and the re-read
+    # above can race with a third write, so recompute the statistics,
+    # unless they were just rebuilt from the tasks anyway
+    if missed and project["_id"] not in rebuilt:
+        await rebuild_stats(project["_id"])
+
+    succeeded = len(changes)
+    logger.info(f"Bulk task operations on project '{project['title']}': {succeeded} applied, {len(results) - succeeded} failed")
+    return BulkTaskResponse(ordered=batch.ordered, succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+TASK_LIST_FIELDS = {"project", "title", "description", "assigned_to", "state", "priority", "deadline", "created_at", "updated_at"}
+
+@project_router.get("/{id}/tasks/", response_model=list[TaskListItem], response_model_exclude_unset=True)
+async def get_project_tasks(
+    id: str,
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    sort: Literal["created_at", "deadline"] = "created_at",
+    state: Optional[TaskState] = None,
+    priority: Optional[TaskPriority] = None,
+    assignee: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma separated list of fields to return, e.g. title,state,deadline"),
+    project_id = Depends(project_member)
+):
     """
-    project = await _fetch_project_for_user(id, current_user)
-    tasks = await get_database()["tasks"].find({
-        "project._id": project["_id"]
-    }).to_list()
-    return tasks
+    List one page of the tasks of a project the current user can access.
+
+    Tasks are returned in (`sort`, `_id`) order, `limit` at a time. When
+    more tasks follow, the `X-Next-Cursor` response header holds the
+    opaque cursor to pass back as `cursor` for the next page. `state`,
+    `priority` and `assignee` filter server-side and `fields` restricts
+    the returned fields (the ID and the sort field are always included).
+    The ETag combines the project's task revision with the query string,
+    and an unchanged page is answered with 304 without querying the tasks.
+    """
+    etag = make_etag(project_id, await tasks_revision(project_id), sorted(request.query_params.multi_items()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    query = {"project._id": project_id}
+    if state is not None:
+        query["state"] = state.value
+    if priority is not None:
+        query["priority"] = priority.value
+    if assignee is not None:
+        if not ObjectId.is_valid(assignee):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid assignee ID format.")
+        query["assigned_to._id"] = ObjectId(assignee)
+    if cursor is not None:
+        value, last_id = decode_cursor(cursor, sort)
+        query = {"$and": [query, keyset_filter(sort, value, last_id)]}
+
+    projection = TASK_FIELDS
+    if fields:
+        selected = {f.strip() for f in fields.split(",") if f.strip()}
+        unknown = selected - TASK_LIST_FIELDS
+        if unknown:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Unknown task fields: {', '.join(sorted(unknown))}")
+        projection = {f: 1 for f in selected | {sort}}
+
+    tasks = await get_database()["tasks"].find(query, projection).sort(
+        [(sort, ASCENDING), ("_id", ASCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    headers = {ETAG_HEADER: etag}
+    cursor_token = next_cursor(tasks, limit, sort)
+    if cursor_token:
+        headers[NEXT_CURSOR_HEADER] = cursor_token
+    response.headers.update(headers)
+    return documents_response(tasks, headers=headers)
+
+@project_router.get("/{id}/tasks/export")
+async def export_project_tasks(
+    id: str,
+    format: Literal["ndjson", "csv"] = "ndjson",
+    project_id = Depends(project_member)
+):
+    """
+    Stream every task of the project as NDJSON (one task per line) or CSV.
+
+    Tasks come in (`created_at`, `_id`) order, which the
+    (`project._id`, `created_at`, `_id`) index serves without an in-memory
+    sort. The Motor cursor is read in batches of `export_batch_size`
+    documents and each batch is written to the response as soon as it
+    arrives, so memory stays flat whatever the size of the project.
+    """
+    cursor = get_database()["tasks"].find({"project._id": project_id}).sort(
+        [("created_at", ASCENDING), ("_id", ASCENDING)]
+    ).batch_size(settings.export_batch_size)
+    if format == "csv":
+        body, media_type = iter_csv(cursor, settings.export_batch_size), "text/csv"
+    else:
+        body, media_type = iter_ndjson(cursor, settings.export_batch_size), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="project-{project_id}-tasks.{format}"'},
+    )
+
+@project_router.get("/{id}/tasks/search", response_model=list[TaskSearchResult])
+async def search_project_tasks(
+    request: Request,
+    response: Response,
+    q: str = Query(..., min_length=1, max_length=200, description="Words to look for in the title and description"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    state: Optional[TaskState] = None,
+    priority: Optional[TaskPriority] = None,
+    project_id = Depends(project_member)
+):
+    """
+    Search the tasks of a project by words of their title or description.
+
+    Uses the `task_search` text index, whose `project._id` prefix limits
+    the search to the project. Results are ranked by relevance (title
+    matches weigh more) and paginated like the task list: `limit` at a
+    time, with the cursor of the next page in `X-Next-Cursor`. `state`
+    and `priority` filter the matches.
+    """
+    etag = make_etag(project_id, await tasks_revision(project_id), sorted(request.query_params.multi_items()))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    match = {"project._id": project_id, "$text": {"$search": q}}
+    if state is not None:
+        match["state"] = state.value
+    if priority is not None:
+        match["priority"] = priority.value
+    pipeline = [{"$match": match}, {"$addFields": {"score": {"$meta": "textScore"}}}]
+    if cursor is not None:
+        value, last_id = decode_cursor(cursor, "score")
+        pipeline.append({"$match": keyset_filter("score", value, last_id, descending=True)})
+    pipeline += [
+        {"$sort": {"score": -1, "_id": -1}},
+        {"$limit": limit + 1},
+        {"$project": {**TASK_FIELDS, "score": 1}},
+    ]
+    tasks = await get_database()["tasks"].aggregate(pipeline).to_list(length=limit + 1)
+    headers = {ETAG_HEADER: etag}
+    cursor_token = next_cursor(tasks, limit, "score")
+    if cursor_token:
+        headers[NEXT_CURSOR_HEADER] = cursor_token
+    response.headers.update(headers)
+    return documents_response(tasks, headers=headers)
 
 @project_router.get("/{project_id}/tasks/{task_id}", response_model=Task)
-async def get_task(project_id: str, task_id: str, current_user: dict = Depends(get_current_user)):
+async def get_task(project_id: str, task_id: str, request: Request, response: Response, access: TaskAccess = Depends(task_reader)):
     """
     Retrieve a single task by project and task ID for authorized users.
 
-    Confirms the current user belongs to the project and that the task
-    references the project before returning it.
+    The `task_reader` dependency confirms the current user belongs to the
+    project and that the task references the project, in one round-trip.
+    Returns 304 if the task's `updated_at` still matches If-None-Match.
     """
-    project = await _fetch_project_for_user(project_id, current_user)
-    task = await get_database()["tasks"].find_one({
-        "_id": ObjectId(task_id),
-        "project._id": project["_id"]
-    })
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    return task
+    etag = make_etag(access.task["_id"], access.task.get("updated_at"))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers[ETAG_HEADER] = etag
+    return access.task
 
 @project_router.delete("/{project_id}/tasks/{task_id}", status_code=status.HTTP_204_NO_CONTENT)
-async def delete_task(project_id: str, task_id: str, current_user: dict = Depends(get_current_user)):
+async def delete_task(project_id: str, task_id: str, access: TaskAccess = Depends(task_manager)):
     """
     Delete a task from a project (manager-only).
 
-    Validates manager privileges and that the task belongs to the project,
-    then deletes the task document.
+    The `task_manager` dependency validates manager privileges and that the
+    task belongs to the project; the task document is then deleted.
     """
-    project = await is_project_manager(ObjectId(project_id), current_user["_id"])
-    task = await get_database()["tasks"].find_one({
-        "_id": ObjectId(task_id),
-        "project._id": project["_id"]
-    })
-    if not task:
-        raise HTTPException(status_code=404, detail="Task not found")
-    await get_database()["tasks"].delete_one({"_id": task["_id"]})
+    task, project = access.task, access.project
+    deleted = await get_database()["tasks"].find_one_and_delete({"_id": task["_id"]})
+    if deleted is not None:
+        await _task_written(deleted, None)
     logger.info(f"Deleted task '{task['title']}' from project '{project['title']}'")
     return
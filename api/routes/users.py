@@ -1,20 +1,56 @@
-from fastapi import APIRouter, Depends
+from datetime import datetime
+from typing import Literal, Optional
+
+from bson import ObjectId
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from pymongo import ASCENDING, ReturnDocument
 
 from db import get_database
-from models.user import UserDataResponse
-from services.auth import get_current_user
+from models.task import Task, TaskPriority, TaskState, UserTaskSummary
+from models.user import UserDataResponse, UserUpdate
+from services.auth import get_current_principal, get_current_user, invalidate_principal
+from services.pagination import NEXT_CURSOR_HEADER, decode_cursor, keyset_filter, next_cursor
+from services.project_deletion import DELETING
+from services.propagation import schedule_propagation
+from services.serialization import documents_response, model_projection
 
 user_router = APIRouter(prefix="/users")
 
+TASK_FIELDS = model_projection(Task)
+
 @user_router.get("/me", response_model=UserDataResponse)
-async def read_users_me(current_user: dict = Depends(get_current_user)):
+async def read_users_me(current_user: dict = Depends(get_current_principal)):
     return UserDataResponse(**current_user)
 
+@user_router.patch("/me", response_model=UserDataResponse)
+async def update_users_me(update: UserUpdate, current_user: dict = Depends(get_current_user)):
+    """
+    Update the current user's first and/or last name.
+
+    The copies of the name embedded in projects, tasks and statistics are
+    updated by a background propagation job, so they may lag behind for a
+    moment. The principal cache is only cleared on this worker: the other
+    workers serve the old name for up to `principal_cache_ttl_seconds`.
+    """
+    fields = update.model_dump(exclude_unset=True, exclude_none=True)
+    if not fields:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Request body cannot be empty.")
+    user = await get_database()["users"].find_one_and_update(
+        {"_id": current_user["_id"]},
+        {"$set": fields},
+        return_document=ReturnDocument.AFTER
+    )
+    invalidate_principal(user["email"])
+    await schedule_propagation("user", user["_id"])
+    return UserDataResponse(**user)
+
 @user_router.get("/me/task-count")
-async def get_task_state_distribution(state:str, current_user: dict = Depends(get_current_user)):
+async def get_task_state_distribution(state:str, current_user: dict = Depends(get_current_principal)):
     
     """
     Show task state distribution for a user 
+
+    GET /users/me/summary returns the counts of every state at once.
     """
     
     pipeline = [
@@ -28,4 +64,93 @@ async def get_task_state_distribution(state:str, current_user: dict = Depends(ge
             "$count": "nb_of_tasks"
         },
     ]
-    return await get_database()["tasks"].aggregate(pipeline).to_list(length=None)
\ No newline at end of file
+    return await get_database()["tasks"].aggregate(pipeline).to_list(length=None)
+
+async def _my_tasks_match(current_user: dict) -> dict:
+    """Filter of the tasks assigned to the user, minus those of projects being deleted."""
+    match = {"assigned_to._id": current_user["_id"]}
+    # Only a handful of projects are being deleted at any time, read on the sparse status index
+    deleting = await get_database()["projects"].distinct("_id", {"status": DELETING})
+    if deleting:
+        match["project._id"] = {"$nin": deleting}
+    return match
+
+@user_router.get("/me/tasks", response_model=list[Task])
+async def get_my_tasks(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    sort: Literal["created_at", "deadline"] = "created_at",
+    state: Optional[TaskState] = None,
+    priority: Optional[TaskPriority] = None,
+    project: Optional[str] = None,
+    current_user: dict = Depends(get_current_principal)
+):
+    """
+    List one page of the tasks assigned to the current user, across projects.
+
+    Tasks are returned in (`sort`, `_id`) order, which the
+    (`assigned_to._id`, `sort`, `_id`) indexes serve without an in-memory
+    sort, `limit` at a time, with the cursor of the next page in the
+    `X-Next-Cursor` header. `state`, `priority` and `project` filter
+    server-side. Tasks of projects being deleted are left out, as in
+    GET /users/me/summary.
+    """
+    query = await _my_tasks_match(current_user)
+    if state is not None:
+        query["state"] = state.value
+    if priority is not None:
+        query["priority"] = priority.value
+    if project is not None:
+        if not ObjectId.is_valid(project):
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid project ID format.")
+        query["project._id"] = {**query.get("project._id", {}), "$eq": ObjectId(project)}
+    if cursor is not None:
+        value, last_id = decode_cursor(cursor, sort)
+        query = {"$and": [query, keyset_filter(sort, value, last_id)]}
+
+    tasks = await get_database()["tasks"].find(query, TASK_FIELDS).sort(
+        [(sort, ASCENDING), ("_id", ASCENDING)]
+    ).limit(limit + 1).to_list(length=limit + 1)
+    cursor_token = next_cursor(tasks, limit, sort)
+    headers = {NEXT_CURSOR_HEADER: cursor_token} if cursor_token else {}
+    response.headers.update(headers)
+    return documents_response(tasks, headers=headers)
+
+@user_router.get("/me/summary", response_model=UserTaskSummary)
+async def get_my_task_summary(current_user: dict = Depends(get_current_principal)):
+    """
+    Count the tasks assigned to the current user across projects.
+
+    One `$facet` aggregation over the user's tasks (matched on the
+    `assigned_to._id` index) returns the counts per state and per
+    priority, with zeros for the missing ones, and the overdue tasks (not
+    completed, deadline passed) in total and per priority. Tasks of
+    projects being deleted are not counted.
+    """
+    pipeline = [
+        {"$match": await _my_tasks_match(current_user)},
+        {"$facet": {
+            "by_state": [{"$group": {"_id": "$state", "count": {"$sum": 1}}}],
+            "by_priority": [{"$group": {"_id": "$priority", "count": {"$sum": 1}}}],
+            "overdue_by_priority": [
+                {"$match": {"state": {"$ne": TaskState.COMPLETED.value}, "deadline": {"$lt": datetime.now()}}},
+                {"$group": {"_id": "$priority", "count": {"$sum": 1}}},
+            ],
+        }},
+    ]
+    result = (await get_database()["tasks"].aggregate(pipeline).to_list(length=1))[0]
+
+    def counts(facet: str, keys) -> dict:
+        found = {group["_id"]: group["count"] for group in result[facet]}
+        return {**{key.value: 0 for key in keys}, **found}
+
+    by_state = counts("by_state", TaskState)
+    overdue_by_priority = counts("overdue_by_priority", TaskPriority)
+    return UserTaskSummary(
+        total=sum(by_state.values()),
+        by_state=by_state,
+        by_priority=counts("by_priority", TaskPriority),
+        overdue=sum(overdue_by_priority.values()),
+        overdue_by_priority=overdue_by_priority,
+    )
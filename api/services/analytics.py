@@ -0,0 +1,171 @@
+"""
+Aggregation stages of the project analytics.
+
+Each builder returns the stages that run *after* the
+`{"$match": {"project._id": ...}}` stage, so the same stages serve both
+the individual analytics endpoints and the facets of the dashboard.
+"""
+
+from datetime import datetime, timedelta
+from typing import Optional
+
+from config import settings
+from services.cache import InProcessCacheBackend, VersionedResultCache
+from services.project_stats import bump_revision, tasks_revision
+
+
+class ProjectRevisionCacheBackend(InProcessCacheBackend):
+    """
+    In-process entries, versioned by the task revision of the project's
+    `project_stats` document, which every worker reads and moves. A write
+    on any worker makes the entries of every worker unreachable.
+    """
+
+    async def get_version(self, namespace):
+        return await tasks_revision(namespace)
+
+    async def bump_version(self, namespace):
+        await bump_revision(namespace)
+
+
+#Analytics results, keyed per project revision: task writes move it
+#through the statistics, the other writes call `analytics_cache.invalidate`
+analytics_cache = VersionedResultCache(
+    ProjectRevisionCacheBackend(
+        max_entries=settings.analytics_cache_max_entries,
+        max_bytes=settings.analytics_cache_max_bytes,
+    ),
+    ttl=settings.analytics_cache_ttl_seconds,
+    enabled=settings.analytics_cache_enabled,
+)
+
+
+def analytics_now() -> datetime:
+    """
+    The current time of the time-dependent analytics (near deadline),
+    truncated to the minute so that it can be part of their cache key.
+    """
+    return datetime.now().replace(second=0, microsecond=0)
+
+
+def project_match(project_id) -> dict:
+    return {"$match": {"project._id": project_id}}
+
+
+def total_tasks_stages() -> list:
+    return [{"$count": "total_tasks"}]
+
+
+def state_priority_stages() -> list:
+    return [
+        {
+            "$group": {
+                "_id": {
+                    "state": "$state",
+                    "priority": "$priority"
+                },
+                "number_task": {"$sum": 1}
+            }
+        }
+    ]
+
+
+def productivity_stages(limit: int) -> list:
+    return [
+        {
+            "$match": {
+                "state": "COMPLETED",
+                "assigned_to._id": {"$exists": True}
+            }
+        },
+        {
+            "$group": {
+                "_id": {
+                    "user_id": {"$toString": "$assigned_to._id"},
+                    "first_name": "$assigned_to.first_name"
+                },
+                "tasks_completed": {"$sum": 1}
+            }
+        },
+        {
+            "$project": {
+                "_id": 0,
+                "first_name": "$_id.first_name",
+                "tasks_completed": 1
+            }
+        },
+        {"$sort": {"tasks_completed": -1}},
+        {"$limit": limit}
+    ]
+
+
+def state_distribution_stages() -> list:
+    return [
+        {
+            "$group": {
+                "_id": "$state",
+                "nb_of_tasks": {"$sum": 1}
+            }
+        },
+        {
+            "$group": {
+                "_id": None,
+                "total_task_count": {"$sum": "$nb_of_tasks"},
+                "states": {
+                    "$push": {
+                        "state": "$_id",
+                        "nb_of_tasks": "$nb_of_tasks"
+                    }
+                }
+            }
+        },
+        {"$unwind": "$states"},
+        {
+            "$project": {
+                "_id": 0,
+                "state": "$states.state",
+                "nb_of_tasks": "$states.nb_of_tasks",
+                "percentage": {
+                    "$multiply": [
+                        {"$divide": ["$states.nb_of_tasks", "$total_task_count"]},
+                        100
+                    ]
+                }
+            }
+        }
+    ]
+
+
+def near_deadline_stages(in_x_days: int, now: Optional[datetime] = None) -> list:
+    now = now or datetime.now()
+    return [
+        {
+            "$match": {
+                "state": {"$ne": "COMPLETED"},
+                "deadline": {"$gte": now, "$lte": now + timedelta(days=in_x_days)}
+            }
+        },
+        {"$sort": {"deadline": 1}}
+    ]
+
+
+DASHBOARD_FACETS = ("total_tasks", "state_priority_breakdown", "state_distribution", "productivity", "near_deadline")
+
+
+def dashboard_pipeline(project_id, facets, productivity_limit: int = 5, in_x_days: int = 3,
+                       now: Optional[datetime] = None) -> list:
+    """
+    One `$facet` pipeline computing the selected dashboard facets over a
+    single scan of the project's tasks.
+    """
+    builders = {
+        "total_tasks": total_tasks_stages,
+        "state_priority_breakdown": state_priority_stages,
+        "state_distribution": state_distribution_stages,
+        "productivity": lambda: productivity_stages(productivity_limit),
+        "near_deadline": lambda: near_deadline_stages(in_x_days, now),
+    }
+    return [
+        project_match(project_id),
+        {"$facet": {name: builders[name]() for name in facets}},
+    ]
@@ -1,22 +1,22 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
+from bson import ObjectId
 
 from config import settings
 from models.user import TokenData
 from db import get_database
+from services.cache import TTLCache
+from services.password_hashing import password_hasher
 
-#Password Hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+#Password Hashing (bcrypt runs on the worker pool, see services/password_hashing.py)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
-
-def get_password_hash(password):
-    return pwd_context.hash(password)
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
 
 #JWT Creation and Verification
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -44,21 +44,64 @@ credentials_exception = HTTPException(
     detail="Could not validate credentials",
     headers={"WWW-Authenticate": "Bearer"},
 )
-#Dependency to get current user
-async def get_current_user(token: str = Depends(oauth2_scheme)):
+#Authenticated principal cache: token subject -> user document (without password)
+principal_cache = TTLCache(maxsize=settings.principal_cache_size, ttl=settings.principal_cache_ttl_seconds)
+
+def principal_claims(user: dict) -> dict:
+    """Signed claims describing the user, embedded in access tokens."""
+    return {
+        "sub": user["email"],
+        "uid": str(user["_id"]),
+        "first_name": user.get("first_name"),
+        "last_name": user.get("last_name"),
+    }
+
+def invalidate_principal(email: str):
+    principal_cache.invalidate(email)
+
+async def get_principal(email: str):
+    user = principal_cache.get(email)
+    if user is None:
+        user = await get_database()["users"].find_one({"email": email}, {"password": 0, "hashed_refresh_token": 0})
+        if user is None:
+            return None
+        principal_cache.set(email, user)
+    return dict(user)
+
+def decode_token(token: str) -> dict:
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = TokenData(email=email)
+        TokenData(email=email)
     except JWTError:
         raise credentials_exception
-    
-    db = get_database()
-    user = await db["users"].find_one({"email": token_data.email})
+    return payload
+
+#Dependency to get current user
+async def get_current_user(token: str = Depends(oauth2_scheme)):
+    payload = decode_token(token)
+    user = await get_principal(payload["sub"])
+    if user is None:
+        raise credentials_exception
+    return user
+
+#Dependency for read-only routes: with `trust_token_claims` the user is
+#built from the signed claims and the database is not touched at all
+async def get_current_principal(token: str = Depends(oauth2_scheme)):
+    payload = decode_token(token)
+    if settings.trust_token_claims and payload.get("uid") and ObjectId.is_valid(payload["uid"]):
+        return {
+            "_id": ObjectId(payload["uid"]),
+            "email": payload["sub"],
+            "first_name": payload.get("first_name"),
+            "last_name": payload.get("last_name"),
+        }
+    user = await get_principal(payload["sub"])
     if user is None:
         raise credentials_exception
     return user
+
 async def get_current_token(token: str = Depends(oauth2_scheme)):
-    return token
\ No newline at end of file
+    return token
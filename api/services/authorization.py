@@ -0,0 +1,184 @@
+from typing import NamedTuple, Optional
+
+from bson import ObjectId
+from fastapi import Depends, HTTPException, status
+
+from config import settings
+from db import get_database
+from services.auth import get_current_principal, get_current_user
+from services.cache import TTLCache
+
+
+#Filter excluding projects being deleted (see services.project_deletion),
+#which must look gone to every reader
+LIVE_PROJECT = {"status": {"$ne": "deleting"}}
+
+
+class TaskAccess(NamedTuple):
+    project: dict
+    task: dict
+    role: Optional[str]
+
+
+def to_object_id(value):
+    try:
+        return ObjectId(value) if not isinstance(value, ObjectId) else value
+    except Exception:
+        return value
+
+
+def member_role(project: dict, user_id) -> Optional[str]:
+    """Return the role of `user_id` in `project`, or None if not a member."""
+    for member in project.get("members", []):
+        if member.get("_id") == user_id:
+            return member.get("role")
+    return None
+
+
+#Membership cache: project_id -> {user_id: role}. Kept up to date
+#write-through by the endpoints that change members and deletions; the
+#TTL bounds how stale it gets after changes made by other workers.
+membership_cache = TTLCache(maxsize=settings.membership_cache_size, ttl=settings.membership_cache_ttl_seconds)
+
+
+def remember_project(project: dict):
+    """Store the membership map of a freshly read or written project."""
+    membership_cache.set(project["_id"], {m["_id"]: m.get("role") for m in project.get("members", [])})
+
+
+def forget_project(project_id):
+    membership_cache.invalidate(to_object_id(project_id))
+
+
+async def get_project_members(project_id) -> dict:
+    """Return `{user_id: role}` for the project ({} if it doesn't exist)."""
+    pid = to_object_id(project_id)
+    members = membership_cache.get(pid)
+    if members is None:
+        project = await get_database()["projects"].find_one({"_id": pid, **LIVE_PROJECT}, {"members._id": 1, "members.role": 1})
+        if project is None:
+            members = {}
+            membership_cache.set(pid, members)
+        else:
+            remember_project(project)
+            members = membership_cache.get(pid)
+    return members
+
+
+async def ensure_project_member(project_id: str, current_user: dict):
+    """
+    Check that the current user belongs to the project and return its
+    ObjectId. Raises HTTPException(404) otherwise. Served from the
+    membership cache, so it usually doesn't touch Mongo.
+    """
+    members = await get_project_members(project_id)
+    if current_user["_id"] not in members:
+        raise HTTPException(status_code=404, detail="Project not found")
+    return to_object_id(project_id)
+
+
+async def is_live_member(project_id, user_id) -> bool:
+    """Uncached check that `user_id` belongs to the (live) project."""
+    return await get_database()["projects"].count_documents(
+        {"_id": to_object_id(project_id), "members._id": user_id, **LIVE_PROJECT}, limit=1
+    ) > 0
+
+
+async def fetch_project_for_user(project_id: str, current_user: dict):
+    """
+    Return the project document if the current user is either a member
+    or a manager. Raises HTTPException(404) if not found or not accessible.
+    Known non-members are turned away by the membership cache.
+    """
+    members = membership_cache.get(to_object_id(project_id))
+    if members is not None and current_user["_id"] not in members:
+        raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_database()["projects"].find_one({
+        "_id": to_object_id(project_id),
+        "members._id": current_user["_id"],
+        **LIVE_PROJECT
+    })
+    if not project:
+        forget_project(project_id)
+        raise HTTPException(status_code=404, detail="Project not found")
+    remember_project(project)
+    return project
+
+
+async def is_project_manager(project_id: str, user_id: str):
+    """
+    Verify whether a user is a manager for a given project.
+
+    Expects `project_id` and `user_id` to be ObjectId-compatible. Raises
+    404 if the project isn't found or the user isn't a manager. Returns
+    the project document on success. Users the membership cache already
+    knows aren't managers are turned away without a query.
+    """
+    members = membership_cache.get(to_object_id(project_id))
+    if members is not None and members.get(to_object_id(user_id)) != "manager":
+        raise HTTPException(status_code=404, detail="Project not found")
+    project = await get_database()["projects"].find_one({
+        "_id": to_object_id(project_id),
+        "members": {"$elemMatch": {"_id": to_object_id(user_id), "role": "manager"}},
+        **LIVE_PROJECT
+    })
+    if not project:
+        forget_project(project_id)
+        raise HTTPException(status_code=404, detail="Project not found")
+    remember_project(project)
+    return project
+
+
+async def fetch_task_for_user(project_id: str, task_id: str, current_user: dict) -> TaskAccess:
+    """
+    Resolve project membership, the user's role and the task in a single
+    round-trip.
+
+    The project is matched on the user's membership and the task is joined
+    with an uncorrelated `$lookup` on `_id` + `project._id`, so both use
+    their indexes. Raises 400 for a malformed task ID and 404 when the
+    project isn't accessible or the task doesn't belong to it.
+    """
+    if not ObjectId.is_valid(task_id):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid task ID format.")
+    pid = to_object_id(project_id)
+    pipeline = [
+        {"$match": {"_id": pid, "members._id": current_user["_id"], **LIVE_PROJECT}},
+        {"$lookup": {
+            "from": "tasks",
+            "pipeline": [{"$match": {"_id": ObjectId(task_id), "project._id": pid}}],
+            "as": "task"
+        }},
+    ]
+    result = await get_database()["projects"].aggregate(pipeline).to_list(length=1)
+    if not result:
+        raise HTTPException(status_code=404, detail="Project not found")
+    project = result[0]
+    tasks = project.pop("task")
+    if not tasks:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return TaskAccess(project=project, task=tasks[0], role=member_role(project, current_user["_id"]))
+
+
+# FastAPI dependencies for `/{project_id}/tasks/{task_id}` routes
+async def task_reader(project_id: str, task_id: str, current_user: dict = Depends(get_current_principal)) -> TaskAccess:
+    return await fetch_task_for_user(project_id, task_id, current_user)
+
+
+async def task_writer(project_id: str, task_id: str, current_user: dict = Depends(get_current_user)) -> TaskAccess:
+    return await fetch_task_for_user(project_id, task_id, current_user)
+
+
+async def task_manager(access: TaskAccess = Depends(task_writer)) -> TaskAccess:
+    if access.role != "manager":
+        raise HTTPException(status_code=404, detail="Project not found")
+    return access
+
+
+# FastAPI dependencies for `/{id}/...` routes
+async def project_member(id: str, current_user: dict = Depends(get_current_principal)):
+    return await ensure_project_member(id, current_user)
+
+
+async def project_manager(id: str, current_user: dict = Depends(get_current_user)) -> dict:
+    return await is_project_manager(id, current_user["_id"])
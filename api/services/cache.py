@@ -0,0 +1,216 @@
+import itertools
+import pickle
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Optional
+
+_MISSING = object()
+
+
+class TTLCache:
+    """
+    Small in-process LRU cache whose entries also expire after `ttl` seconds.
+
+    Not thread-safe; it is only meant to be used from the event loop.
+    Each worker process has its own copy, so the TTL bounds how stale an
+    entry can get when another worker changes the underlying data.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is _MISSING:
+            self.misses += 1
+            return default
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class CacheBackend(ABC):
+    """
+    Storage and namespace versions of `VersionedResultCache`.
+
+    Methods are coroutines so that a shared backend (e.g. Redis) or a
+    version read from the database can implement them.
+    """
+
+    @abstractmethod
+    async def get(self, key: Hashable) -> Any:
+        """Return the cached value or `_MISSING`."""
+
+    @abstractmethod
+    async def set(self, key: Hashable, value: Any, ttl: float):
+        ...
+
+    @abstractmethod
+    async def get_version(self, namespace: Hashable) -> Hashable:
+        ...
+
+    @abstractmethod
+    async def bump_version(self, namespace: Hashable):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+class InProcessCacheBackend(CacheBackend):
+    """
+    LRU backend bounded by both an entry count and an approximate memory
+    budget (the pickled size of the values).
+
+    Its namespace versions live in the process too: with several workers,
+    a bump on one of them leaves the others serving their entries until
+    the TTL expires. Override `get_version`/`bump_version` with a shared
+    counter to avoid that (see `services.analytics`).
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[Hashable, tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        # Versions are never reused, so an evicted version can't make an
+        # old entry valid again
+        self._versions = TTLCache(maxsize=max(1000, max_entries * 4), ttl=float("inf"))
+        self._next_version = itertools.count(1)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def get(self, key: Hashable) -> Any:
+        entry = self._data.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return _MISSING
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    async def set(self, key: Hashable, value: Any, ttl: float):
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            return
+        if size > self.max_bytes:
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (time.monotonic() + ttl, size, value)
+        self._bytes += size
+        while len(self._data) > self.max_entries or self._bytes > self.max_bytes:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    async def get_version(self, namespace: Hashable) -> int:
+        version = self._versions.get(namespace)
+        if version is None:
+            version = next(self._next_version)
+            self._versions.set(namespace, version)
+        return version
+
+    async def bump_version(self, namespace: Hashable):
+        self._versions.set(namespace, next(self._next_version))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+class VersionedResultCache:
+    """
+    Cache of computed results keyed by (endpoint, namespace, params) and
+    the current version of the namespace. Bumping the version of a
+    namespace (a project) makes all of its entries unreachable at once;
+    they then age out of the LRU. Entries are only as fresh as the
+    backend's versions are shared (see `InProcessCacheBackend`).
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float, enabled: bool = True):
+        self.backend = backend
+        self.ttl = ttl
+        self.enabled = enabled
+
+    async def get_or_compute(self, endpoint: str, namespace: Hashable, params: dict, compute: Callable[[], Awaitable[Any]]) -> Any:
+        if not self.enabled:
+            return await compute()
+        version = await self.backend.get_version(namespace)
+        key = (endpoint, namespace, version, tuple(sorted(params.items())))
+        value = await self.backend.get(key)
+        if value is not _MISSING:
+            return value
+        value = await compute()
+        # Stored under the version read before computing: if a write bumped
+        # it meanwhile, this entry is simply never served
+        await self.backend.set(key, value, self.ttl)
+        return value
+
+    async def invalidate(self, namespace: Hashable):
+        await self.backend.bump_version(namespace)
+
+    def stats(self) -> dict:
+        return self.backend.stats()
@@ -0,0 +1,35 @@
+"""
+Conditional GETs (ETag / If-None-Match).
+
+Read endpoints derive a weak ETag from the revision of what they return
+(the `revision`/`updated_at` of a project or task, or the task revision
+of a project for task lists) *before* reading the documents themselves,
+and answer `304 Not Modified` without reading or serializing the body
+when the client already has that version.
+"""
+
+import hashlib
+
+from fastapi import Request, Response, status
+
+ETAG_HEADER = "ETag"
+
+
+def make_etag(*parts) -> str:
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()[:24]
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of `etag` with the request's If-None-Match header."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={ETAG_HEADER: etag})
@@ -0,0 +1,101 @@
+"""
+In-process pub/sub of project events.
+
+The write handlers of `project_router` publish task and membership events
+to `event_hub`; every WebSocket connected to GET /projects/{id}/events
+holds a `Subscription` with a bounded queue. Publishing never waits: a
+subscriber whose queue is full is evicted (it receives `EVICTED` and its
+connection is closed) so one slow client can't hold up the writers or
+make the hub buffer without limit.
+
+The hub only sees the writes of its own process; with several workers,
+`publish` is the place to fan out through a shared broker.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Hashable, Optional
+
+from config import settings
+
+logger = logging.getLogger("inf3-projet-api")
+
+#Last message of an evicted or closed subscription
+EVICTED = object()
+CLOSED = object()
+
+
+class Subscription:
+    def __init__(self, hub: "EventHub", project_id: Hashable, user_id: Hashable, queue_size: int):
+        self.hub = hub
+        self.project_id = project_id
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.closed = False
+
+    def _end(self, reason, discard_pending: bool = False):
+        # Pending events are still delivered before the end marker, unless
+        # discarded or the queue has no room left for the marker
+        while not self.queue.empty() and (discard_pending or self.queue.full()):
+            self.queue.get_nowait()
+        self.queue.put_nowait(reason)
+        self.closed = True
+
+    async def next(self):
+        """Next event, or `EVICTED` / `CLOSED` once the subscription ended."""
+        return await self.queue.get()
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+
+class EventHub:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions: "defaultdict[Hashable, set[Subscription]]" = defaultdict(set)
+        self.published = 0
+        self.evictions = 0
+
+    def subscribe(self, project_id: Hashable, user_id: Hashable) -> Subscription:
+        subscription = Subscription(self, project_id, user_id, self.queue_size)
+        self._subscriptions[project_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.project_id)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.project_id]
+
+    def publish(self, project_id: Hashable, event: str):
+        """Queue `event`, an already encoded JSON message, for the project's subscribers."""
+        self.published += 1
+        for subscription in list(self._subscriptions.get(project_id, ())):
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                self.evictions += 1
+                logger.warning("Evicted slow event subscriber of project %s", project_id)
+                self.unsubscribe(subscription)
+                subscription._end(EVICTED, discard_pending=True)
+
+    def close_project(self, project_id: Hashable, user_id: Optional[Hashable] = None):
+        """End the subscriptions of a project, or only those of `user_id`."""
+        for subscription in list(self._subscriptions.get(project_id, ())):
+            if user_id is None or subscription.user_id == user_id:
+                self.unsubscribe(subscription)
+                subscription._end(CLOSED)
+
+    def stats(self) -> dict:
+        return {
+            "projects": len(self._subscriptions),
+            "subscribers": sum(len(s) for s in self._subscriptions.values()),
+            "published": self.published,
+            "evictions": self.evictions,
+        }
+
+
+event_hub = EventHub(queue_size=settings.events_queue_size)
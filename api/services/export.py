@@ -0,0 +1,76 @@
+"""
+Streaming task export.
+
+The encoders consume an async iterable of task documents (normally a
+Motor cursor) and yield encoded chunks of at most `chunk_size` documents,
+so memory use only depends on the chunk size and never on the number of
+tasks being exported.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator
+
+from bson import ObjectId
+
+CSV_COLUMNS = [
+    "_id", "project_id", "project_title", "title", "description", "state", "priority",
+    "assigned_to_id", "assigned_to_email", "deadline", "created_at", "updated_at",
+]
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def _csv_row(task: dict) -> list:
+    project = task.get("project") or {}
+    assigned_to = task.get("assigned_to") or {}
+    return [_csv_value(v) for v in (
+        task.get("_id"), project.get("_id"), project.get("project_title"), task.get("title"),
+        task.get("description"), task.get("state"), task.get("priority"),
+        assigned_to.get("_id"), assigned_to.get("email"),
+        task.get("deadline"), task.get("created_at"), task.get("updated_at"),
+    )]
+
+
+async def iter_ndjson(tasks: AsyncIterable[dict], chunk_size: int = 500) -> AsyncIterator[bytes]:
+    lines = []
+    async for task in tasks:
+        lines.append(json.dumps(task, default=_default, ensure_ascii=False))
+        if len(lines) >= chunk_size:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+
+async def iter_csv(tasks: AsyncIterable[dict], chunk_size: int = 500) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_COLUMNS)
+    rows = 0
+    async for task in tasks:
+        writer.writerow(_csv_row(task))
+        rows += 1
+        if rows >= chunk_size:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            rows = 0
+    if buffer.tell():
+        yield buffer.getvalue().encode()
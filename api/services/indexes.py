@@ -0,0 +1,419 @@
+"""
+Index registry and schema migrations.
+
+`INDEXES` declares every index the API relies on, per collection, and
+`MIGRATIONS` the versioned steps bringing an existing database to it
+(applied versions are recorded in `schema_migrations`). Startup only
+warns about pending migrations and missing indexes (it creates the
+missing ones when `sync_indexes_on_startup` is turned on); deploys run:
+
+    python -m services.indexes migrate   # pending migrations + missing indexes
+    python -m services.indexes status    # applied versions, missing/extra indexes
+    python -m services.indexes verify    # explain() every query shape, fail on COLLSCAN
+
+`verify` explains the query shapes of routes/projects.py, routes/users.py
+and services/auth.py (with the authorization and refresh token helpers
+they call) and of the background workers (claims, deletion and
+propagation batches) against the current indexes and exits non-zero if
+any of them scans a whole collection, so a new query without an index is
+caught before it reaches production. It needs a real server (mongomock can't
+explain queries) and is a command to run against a migrated database
+before a release, not a test: the API has no test suite that runs it.
+"""
+
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, NamedTuple
+
+from bson import ObjectId
+from pymongo import ASCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+from db import get_database
+from services.project_stats import COLLECTION as STATS_COLLECTION, rebuild_stats
+
+logger = logging.getLogger("inf3-projet-api")
+
+MIGRATIONS_COLLECTION = "schema_migrations"
+
+#Collection -> indexes (besides _id). Queries on a prefix of a compound
+#index use it, so no single-field index duplicates a compound prefix.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "tasks": [
+        IndexModel([("project._id", ASCENDING), ("state", ASCENDING), ("priority", ASCENDING)]),
+        IndexModel([("assigned_to._id", ASCENDING), ("state", ASCENDING)]),
+        # GET /users/me/tasks pages, in creation and in deadline order
+        IndexModel([("assigned_to._id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("assigned_to._id", ASCENDING), ("deadline", ASCENDING), ("_id", ASCENDING)]),
+        # Keyset pages in creation order, and project-wide scans
+        IndexModel([("project._id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        # Keyset pages in deadline order, and the near-deadline range
+        IndexModel([("project._id", ASCENDING), ("deadline", ASCENDING), ("_id", ASCENDING)]),
+        # GET /projects/{id}/tasks/search; the equality prefix scopes it to a project.
+        # No language: no stemming nor stop words, task texts aren't all English
+        IndexModel(
+            [("project._id", ASCENDING), ("title", TEXT), ("description", TEXT)],
+            name="task_search", weights={"title": 3, "description": 1}, default_language="none",
+        ),
+    ],
+    "projects": [
+        IndexModel([("members._id", ASCENDING), ("members.role", ASCENDING)]),
+        # Only projects being deleted have a status
+        IndexModel([("status", ASCENDING)], sparse=True),
+    ],
+    "refresh_tokens": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("session_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "propagation_jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600),
+    ],
+}
+
+
+def _name(index: IndexModel) -> str:
+    return index.document["name"]
+
+
+async def create_missing_indexes(db) -> list:
+    """Create the registry indexes missing from `db`; returns their names."""
+    created = []
+    for collection, indexes in INDEXES.items():
+        existing = await db[collection].index_information()
+        missing = [index for index in indexes if _name(index) not in existing]
+        if missing:
+            created += await db[collection].create_indexes(missing)
+    return created
+
+
+async def _drop_indexes(db, collection: str, names: list):
+    existing = await db[collection].index_information()
+    for name in names:
+        if name in existing:
+            await db[collection].drop_index(name)
+            logger.info("Dropped index %s.%s", collection, name)
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    apply: Callable[..., Awaitable[None]]
+
+
+#The registry as of version 1 (the indexes startup used to create).
+#Later indexes come with their own migration, so this must not change.
+_VERSION_1_INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], unique=True),
+    ],
+    "tasks": [
+        IndexModel([("project._id", ASCENDING), ("state", ASCENDING), ("priority", ASCENDING)]),
+        IndexModel([("assigned_to._id", ASCENDING), ("state", ASCENDING)]),
+        IndexModel([("project._id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)]),
+        IndexModel([("project._id", ASCENDING), ("deadline", ASCENDING), ("_id", ASCENDING)]),
+    ],
+    "projects": [
+        IndexModel([("members._id", ASCENDING), ("members.role", ASCENDING)]),
+        IndexModel([("status", ASCENDING)], sparse=True),
+    ],
+    "refresh_tokens": [
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+        IndexModel([("session_id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "propagation_jobs": [
+        IndexModel([("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("finished_at", ASCENDING)], expireAfterSeconds=7 * 24 * 3600),
+    ],
+}
+
+
+async def _create_registry(db):
+    for collection, indexes in _VERSION_1_INDEXES.items():
+        await db[collection].create_indexes(indexes)
+
+
+async def _drop_redundant_prefixes(db):
+    # Prefixes of (project._id, state, priority) and (members._id, members.role)
+    await _drop_indexes(db, "tasks", ["project._id_1"])
+    await _drop_indexes(db, "projects", ["members._id_1"])
+
+
+async def _create_task_indexes(db, names: list):
+    await db["tasks"].create_indexes([index for index in INDEXES["tasks"] if _name(index) in names])
+
+
+async def _create_task_search(db):
+    await _create_task_indexes(db, ["task_search"])
+
+
+async def _create_assignee_pages(db):
+    await _create_task_indexes(db, ["assigned_to._id_1_created_at_1__id_1", "assigned_to._id_1_deadline_1__id_1"])
+
+
+async def _build_missing_stats(db):
+    # New projects get theirs on creation; a task write racing this still
+    # finds no document and rebuilds it (see record_task_changes)
+    built = set(await db[STATS_COLLECTION].distinct("_id"))
+    async for project in db["projects"].find({}, {"_id": 1}):
+        if project["_id"] not in built:
+            await rebuild_stats(project["_id"])
+
+
+MIGRATIONS = [
+    Migration(1, "Create the registry indexes (previously created at startup)", _create_registry),
+    Migration(2, "Drop single-field indexes duplicating compound index prefixes", _drop_redundant_prefixes),
+    Migration(3, "Create the task_search text index of GET /projects/{id}/tasks/search", _create_task_search),
+    Migration(4, "Create the (assigned_to._id, created_at|deadline, _id) indexes of GET /users/me/tasks", _create_assignee_pages),
+    Migration(5, "Build the project_stats documents of the projects created without one", _build_missing_stats),
+]
+
+
+async def applied_versions(db) -> set:
+    return set(await db[MIGRATIONS_COLLECTION].distinct("_id"))
+
+
+async def pending_migrations(db) -> list:
+    applied = await applied_versions(db)
+    return [migration for migration in MIGRATIONS if migration.version not in applied]
+
+
+async def migrate(db) -> list:
+    """Apply the pending migrations in order, then create missing indexes."""
+    applied = []
+    for migration in await pending_migrations(db):
+        logger.info("Applying migration %d: %s", migration.version, migration.description)
+        await migration.apply(db)
+        await db[MIGRATIONS_COLLECTION].insert_one({
+            "_id": migration.version,
+            "description": migration.description,
+            "applied_at": datetime.now(),
+        })
+        applied.append(migration.version)
+    created = await create_missing_indexes(db)
+    if created:
+        logger.info("Created indexes %s", ", ".join(created))
+    return applied
+
+
+async def index_drift(db) -> dict:
+    """Registry indexes missing from `db` and indexes of `db` not in the registry."""
+    drift = {}
+    for collection, indexes in INDEXES.items():
+        existing = set(await db[collection].index_information()) - {"_id_"}
+        declared = {_name(index) for index in indexes}
+        missing, extra = sorted(declared - existing), sorted(existing - declared)
+        if missing or extra:
+            drift[collection] = {"missing": missing, "extra": extra}
+    return drift
+
+
+async def warn_if_outdated():
+    """
+    Startup check: log pending migrations and missing registry indexes,
+    which `python -m services.indexes migrate` applies.
+    """
+    try:
+        pending = await pending_migrations(get_database())
+        drift = await index_drift(get_database())
+    except Exception:
+        logger.exception("Could not check schema migrations")
+        return
+    if pending:
+        logger.warning(
+            "%d schema migration(s) pending (%s): run `python -m services.indexes migrate`",
+            len(pending), ", ".join(str(migration.version) for migration in pending),
+        )
+    missing = [f"{collection}.{name}" for collection, found in drift.items() for name in found["missing"]]
+    if missing:
+        logger.warning("Missing indexes %s: run `python -m services.indexes migrate`", ", ".join(missing))
+
+
+class QueryShape(NamedTuple):
+    name: str
+    collection: str
+    #find: {"filter", "sort", "projection"}; aggregate: {"pipeline"}
+    command: dict
+
+
+def _find(name: str, collection: str, filter: dict, sort: dict = None, projection: dict = None) -> QueryShape:
+    command = {"find": collection, "filter": filter}
+    if sort:
+        command["sort"] = sort
+    if projection:
+        command["projection"] = projection
+    return QueryShape(name, collection, command)
+
+
+def _aggregate(name: str, collection: str, pipeline: list) -> QueryShape:
+    return QueryShape(name, collection, {"aggregate": collection, "pipeline": pipeline, "cursor": {}})
+
+
+def query_shapes() -> list:
+    """
+    The queries (and the filters of the updates/deletes) issued by the
+    request handlers, built with sample values from the same helpers the
+    handlers use where there is one.
+    """
+    from services.analytics import DASHBOARD_FACETS, dashboard_pipeline, near_deadline_stages, project_match
+    from services.authorization import LIVE_PROJECT
+    from services.pagination import keyset_filter
+
+    user_id, project_id, task_id, now = ObjectId(), ObjectId(), ObjectId(), datetime.now()
+    manager = {"$elemMatch": {"_id": user_id, "role": "manager"}}
+    shapes = [
+        # services/auth.py, routes/auth.py
+        _find("user by email", "users", {"email": "user@example.com"}),
+        _find("refresh token by digest", "refresh_tokens", {"_id": "digest", "used_at": None, "expires_at": {"$gt": now}}),
+        _find("refresh tokens of a session", "refresh_tokens", {"session_id": "session"}),
+        _find("refresh tokens of a user", "refresh_tokens", {"user_id": user_id}),
+        # routes/users.py
+        _find("user by id", "users", {"_id": user_id}),
+        _aggregate("user task count", "tasks", [
+            {"$match": {"assigned_to._id": user_id, "state": "COMPLETED"}}, {"$count": "nb_of_tasks"},
+        ]),
+        _find("projects being deleted", "projects", {"status": "deleting"}, projection={"_id": 1}),
+        *(_find(f"tasks of a user by {sort}", "tasks", {"$and": [
+            {"assigned_to._id": user_id, "project._id": {"$nin": [project_id]}, "state": "COMPLETED"},
+            keyset_filter(sort, now, task_id),
+        ]}, sort={sort: 1, "_id": 1}) for sort in ("created_at", "deadline")),
+        _aggregate("user task summary", "tasks", [
+            {"$match": {"assigned_to._id": user_id, "project._id": {"$nin": [project_id]}}},
+            {"$facet": {"by_state": [{"$group": {"_id": "$state", "count": {"$sum": 1}}}]}},
+        ]),
+        # routes/projects.py and services/authorization.py
+        _find("projects of a member", "projects", {"members._id": user_id, **LIVE_PROJECT}),
+        _find("project members", "projects", {"_id": project_id, **LIVE_PROJECT}, projection={"members._id": 1}),
+        _find("project of a member", "projects", {"_id": project_id, "members._id": user_id, **LIVE_PROJECT}),
+        _find("project of a manager", "projects", {"_id": project_id, "members": manager, **LIVE_PROJECT}),
+        _find("membership update", "projects", {"_id": project_id, **LIVE_PROJECT, "$and": [
+            {"members": manager}, {"members._id": {"$ne": user_id}},
+        ]}),
+        _aggregate("task with access check", "projects", [
+            {"$match": {"_id": project_id, "members._id": user_id, **LIVE_PROJECT}},
+            {"$lookup": {
+                "from": "tasks",
+                "pipeline": [{"$match": {"_id": task_id, "project._id": project_id}}],
+                "as": "task",
+            }},
+        ]),
+        _find("tasks of a bulk request", "tasks", {"_id": {"$in": [task_id]}, "project._id": project_id}),
+        _find("task by id", "tasks", {"_id": task_id}),
+        _find("assigned tasks of a removed member", "tasks", {"project._id": project_id, "assigned_to._id": user_id}),
+        _find("task export", "tasks", {"project._id": project_id}, sort={"created_at": 1, "_id": 1}),
+        _aggregate("near-deadline tasks", "tasks", [project_match(project_id)] + near_deadline_stages(3)),
+        _aggregate("dashboard", "tasks", dashboard_pipeline(project_id, DASHBOARD_FACETS)),
+        _aggregate("task search", "tasks", [
+            {"$match": {"project._id": project_id, "$text": {"$search": "report"}, "state": "NOT STARTED"}},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+            {"$sort": {"score": -1, "_id": -1}},
+            {"$limit": 21},
+        ]),
+        _find("project stats", "project_stats", {"_id": project_id}),
+        # Background workers
+        _find("project deletion claim", "projects", {"status": "deleting", "$or": [
+            {"deletion.lease_until": {"$exists": False}}, {"deletion.lease_until": {"$lt": now}},
+        ]}, sort={"deletion.requested_at": 1}),
+        _find("propagation job claim", "propagation_jobs", {"$or": [
+            {"status": "pending"}, {"status": "running", "lease_until": {"$lt": now}},
+        ]}, sort={"created_at": 1}),
+        # services/project_deletion.py
+        _find("deletion batch", "tasks", {"project._id": project_id}, projection={"_id": 1}),
+        # services/propagation.py, user rename
+        _find("projects of a user's completed tasks", "tasks", {"assigned_to._id": user_id, "state": "COMPLETED"},
+              projection={"project._id": 1}),
+        _find("stats holding a user's name", "project_stats", {
+            "_id": {"$in": [project_id], "$gt": project_id}, f"completed_by.{user_id}": {"$exists": True},
+        }, sort={"_id": 1}),
+        _find("projects of a renamed user", "projects", {"members._id": user_id, "_id": {"$gt": project_id}}, sort={"_id": 1}),
+    ]
+    # Propagation batches of the task stages (user and project renames),
+    # first and resumed after a saved key
+    for field, value in (("assigned_to._id", user_id), ("project._id", project_id)):
+        label = f"propagation batch of tasks by {field}"
+        shapes.append(_find(label, "tasks", {field: value}, sort={"created_at": 1, "_id": 1}))
+        shapes.append(_find(label + " after a key", "tasks", {field: value, **keyset_filter("created_at", now, task_id)},
+                            sort={"created_at": 1, "_id": 1}))
+    # Task list pages: every sort, filter and cursor combination
+    for sort in ("created_at", "deadline"):
+        for filters in ({}, {"state": "NOT STARTED"}, {"priority": "HIGH"},
+                        {"state": "NOT STARTED", "priority": "HIGH"}, {"assigned_to._id": user_id}):
+            query = {"project._id": project_id, **filters}
+            label = f"task page by {sort}" + (f" filtered on {', '.join(filters)}" if filters else "")
+            shapes.append(_find(label, "tasks", query, sort={sort: 1, "_id": 1}))
+            shapes.append(_find(label + " after a cursor", "tasks",
+                                {"$and": [query, keyset_filter(sort, now, task_id)]}, sort={sort: 1, "_id": 1}))
+    return shapes
+
+
+def _collscans(plan) -> int:
+    if isinstance(plan, dict):
+        return (plan.get("stage") == "COLLSCAN") + sum(_collscans(value) for value in plan.values())
+    if isinstance(plan, list):
+        return sum(_collscans(value) for value in plan)
+    return 0
+
+
+def _plans(explain):
+    """(key, value) of every nested item of an explain output."""
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            yield key, value
+            yield from _plans(value)
+    elif isinstance(explain, list):
+        for value in explain:
+            yield from _plans(value)
+
+
+async def verify(db) -> list:
+    """Explain every query shape; returns the names of those scanning a collection."""
+    failures = []
+    for shape in query_shapes():
+        explain = await db.command({"explain": shape.command, "verbosity": "queryPlanner"})
+        # Only the winning plans count, rejected candidates may be collection scans
+        scans = sum(_collscans(value) for key, value in _plans(explain) if key == "winningPlan")
+        logger.info("%-60s %s", shape.name, "COLLSCAN" if scans else "ok")
+        if scans:
+            failures.append(shape.name)
+    return failures
+
+
+async def _main(args) -> int:
+    from db import close_mongo_connection, connect_to_mongo
+
+    await connect_to_mongo()
+    db = get_database()
+    try:
+        if args.command == "migrate":
+            applied = await migrate(db)
+            print(f"{len(applied)} migration(s) applied, schema at version {max(await applied_versions(db), default=0)}")
+        elif args.command == "status":
+            applied = await applied_versions(db)
+            for migration in MIGRATIONS:
+                print(f"{'applied' if migration.version in applied else 'pending':8} {migration.version:3} {migration.description}")
+            for collection, drift in (await index_drift(db)).items():
+                print(f"{collection}: missing {drift['missing'] or '-'}, not in registry {drift['extra'] or '-'}")
+        else:
+            failures = await verify(db)
+            print(f"{len(failures)} query shape(s) scanning a collection" + (f": {', '.join(failures)}" if failures else ""))
+            return 1 if failures else 0
+    except OperationFailure as error:
+        print(f"MongoDB error: {error}")
+        return 1
+    finally:
+        await close_mongo_connection()
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Manage the MongoDB indexes and schema migrations.")
+    parser.add_argument("command", choices=["migrate", "status", "verify"])
+    raise SystemExit(asyncio.run(_main(parser.parse_args())))
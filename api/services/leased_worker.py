@@ -0,0 +1,114 @@
+"""
+Leased background workers.
+
+A `LeasedWorker` is a single background task per process working through
+the documents of a collection that match its claim filter, one at a
+time. A document is claimed with one `find_one_and_update` setting its
+lease, so several workers (processes) never process the same document at
+once; a document whose processing failed, or whose worker died, keeps its
+lease and is claimed again once the lease expires, by any worker. Between
+claims the task sleeps `poll_interval` seconds, or until `wake()` is
+called by the request handler that queued new work.
+
+Subclasses define which documents to claim and `_process`, which must be
+idempotent and should renew the lease (`_lease_until()`) as it makes
+progress.
+"""
+
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+
+from db import get_database
+
+logger = logging.getLogger("inf3-projet-api")
+
+
+class LeasedWorker(ABC):
+    #Collection of the claimed documents, and what a document is in logs
+    collection: str
+    kind: str
+    #Order in which claimable documents are processed
+    sort: list
+    #Fields returned by the claim (None for the whole document)
+    projection: Optional[dict] = None
+
+    def __init__(self, batch_size: int, batch_interval: float, lease: float, poll_interval: float):
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self._task: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def wake(self):
+        self._wake.set()
+        self.start()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _lease_until(self) -> datetime:
+        return datetime.now() + timedelta(seconds=self.lease)
+
+    @abstractmethod
+    def claim_filter(self, now: datetime) -> dict:
+        """Documents that are waiting, or whose lease expired before `now`."""
+
+    @abstractmethod
+    def claim_update(self, lease_until: datetime) -> dict:
+        """Update taking the lease of a claimed document."""
+
+    @abstractmethod
+    async def _process(self, document: dict):
+        ...
+
+    async def _claim(self) -> Optional[dict]:
+        return await get_database()[self.collection].find_one_and_update(
+            self.claim_filter(datetime.now()),
+            self.claim_update(self._lease_until()),
+            projection=self.projection,
+            sort=self.sort,
+            return_document=ReturnDocument.AFTER,
+        )
+
+    async def _run(self):
+        while True:
+            try:
+                document = await self._claim()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Mongo unreachable (boot, failover): keep polling instead of ending the task
+                logger.exception("claiming a %s failed", self.kind)
+                await asyncio.sleep(self.poll_interval)
+                continue
+            if document is None:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            try:
+                await self._process(document)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Left leased: retried from its saved progress once the lease expires
+                logger.exception("%s %s failed", self.kind, document["_id"])
+                await asyncio.sleep(self.poll_interval)
@@ -0,0 +1,330 @@
+"""
+Process metrics of the API, exposed in the Prometheus text format on
+GET /metrics (see `render`).
+
+- `MetricsMiddleware` times every HTTP request per route template and
+  counts the MongoDB commands it issued; the count and the time spent in
+  MongoDB are also sent back in the `X-DB-Calls` and `Server-Timing`
+  response headers.
+- `command_metrics`, a pymongo `CommandListener`, times every command per
+  collection and command name and counts the documents returned (cursor
+  batches) and written (`n` of the write commands). The number of
+  documents examined isn't in the command replies; use `explain()` or the
+  database profiler for it.
+- `pool_metrics` is registered as a pymongo `ConnectionPoolListener` by
+`db.connect_to_mongo` and records how long operations wait to check a
+connection out of the pool. Waits growing with the load mean the pool
+(`mongo_max_pool_size`, per uvicorn worker) is too small for the
+concurrency of a worker; checkout failures with the "timeout" reason mean
+`mongo_wait_queue_timeout_ms` was reached.
+
+Motor runs pymongo on a thread pool, so listeners are called from several
+threads and the collectors are locked.
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional, Sequence
+
+from pymongo import monitoring
+
+#Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+#Upper bounds of the per-request MongoDB command count histogram
+DB_CALLS_BUCKETS = (0, 1, 2, 3, 4, 5, 8, 13, 21, 34, 55)
+
+DB_CALLS_HEADER = "X-DB-Calls"
+
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics)."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+            if index < len(self.counts):
+                self.counts[index] += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            cumulative, total = [], 0
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                cumulative.append((bound, total))
+            return {"buckets": cumulative, "count": self.count, "sum": self.sum, "max": self.max}
+
+
+class HistogramFamily:
+    """Histograms of one metric, one per combination of label values."""
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.children: dict[tuple, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values) -> Histogram:
+        histogram = self.children.get(values)
+        if histogram is None:
+            with self._lock:
+                histogram = self.children.setdefault(values, Histogram(self.buckets))
+        return histogram
+
+
+class CounterFamily:
+    def __init__(self):
+        self.values: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def inc(self, labels: tuple, amount: float = 1):
+        with self._lock:
+            self.values[labels] += amount
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self.checkout_wait = Histogram()
+        self.checkout_failures: Counter = Counter()
+        self.checked_out = 0
+        self.connections = 0
+        self.pools_cleared = 0
+        self._lock = threading.Lock()
+
+    def connection_checked_out(self, event):
+        self.checkout_wait.observe(event.duration)
+        with self._lock:
+            self.checked_out += 1
+
+    def connection_check_out_failed(self, event):
+        self.checkout_wait.observe(event.duration)
+        with self._lock:
+            self.checkout_failures[event.reason] += 1
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_created(self, event):
+        with self._lock:
+            self.connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.connections -= 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pools_cleared += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def stats(self) -> dict:
+        wait = self.checkout_wait.snapshot()
+        with self._lock:
+            return {
+                "connections": self.connections,
+                "checked_out": self.checked_out,
+                "pools_cleared": self.pools_cleared,
+                "checkout_failures": dict(self.checkout_failures),
+                "checkouts": wait["count"],
+                "checkout_wait_avg_ms": 1000 * wait["sum"] / wait["count"] if wait["count"] else 0.0,
+                "checkout_wait_max_ms": 1000 * wait["max"],
+            }
+
+
+class RequestStats:
+    """MongoDB usage of the current request."""
+
+    __slots__ = ("db_calls", "db_seconds")
+
+    def __init__(self):
+        self.db_calls = 0
+        self.db_seconds = 0.0
+
+
+#Set by MetricsMiddleware for the duration of a request. Motor copies the
+#context into its executor threads, so the listener sees it.
+_request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+#Commands naming their collection in another field than the command name
+_COLLECTION_FIELDS = {"getMore": "collection"}
+_WRITE_COMMANDS = {"insert", "update", "delete"}
+
+
+def _collection(command_name: str, command: dict) -> str:
+    value = command.get(_COLLECTION_FIELDS.get(command_name, command_name))
+    return value if isinstance(value, str) else ""
+
+
+class CommandMetrics(monitoring.CommandListener):
+    def __init__(self):
+        self.duration = HistogramFamily()
+        self.failures = CounterFamily()
+        self.documents_returned = CounterFamily()
+        self.documents_written = CounterFamily()
+        #(connection, request id) -> (collection, request stats) of running commands
+        self._running: dict = {}
+
+    def started(self, event):
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.db_calls += 1
+        self._running[(event.connection_id, event.request_id)] = (
+            _collection(event.command_name, event.command), stats
+        )
+
+    def _finished(self, event) -> tuple:
+        collection, stats = self._running.pop((event.connection_id, event.request_id), ("", None))
+        seconds = event.duration_micros / 1e6
+        if stats is not None:
+            stats.db_seconds += seconds
+        self.duration.labels(collection, event.command_name).observe(seconds)
+        return collection
+
+    def succeeded(self, event):
+        collection = self._finished(event)
+        reply = event.reply
+        cursor = reply.get("cursor")
+        if cursor is not None:
+            batch = cursor.get("firstBatch", cursor.get("nextBatch", ()))
+            self.documents_returned.inc((collection, event.command_name), len(batch))
+        elif event.command_name in _WRITE_COMMANDS:
+            self.documents_written.inc((collection, event.command_name), reply.get("n", 0))
+        elif event.command_name == "findAndModify":
+            self.documents_returned.inc((collection, event.command_name), int(reply.get("value") is not None))
+
+    def failed(self, event):
+        collection = self._finished(event)
+        self.failures.inc((collection, event.command_name))
+
+
+class HTTPMetrics:
+    def __init__(self):
+        self.duration = HistogramFamily()
+        self.db_calls = HistogramFamily(DB_CALLS_BUCKETS)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing HTTP requests per route template (the matched
+    path like "/projects/{id}", so IDs don't multiply the series).
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status_code = 500
+
+        async def send_with_headers(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [
+                    (DB_CALLS_HEADER.lower().encode(), str(stats.db_calls).encode()),
+                    (b"server-timing", f"db;dur={stats.db_seconds * 1000:.1f}".encode()),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _request_stats.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            http_metrics.duration.labels(scope["method"], path, str(status_code)).observe(time.perf_counter() - started)
+            http_metrics.db_calls.labels(scope["method"], path).observe(stats.db_calls)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence, le: Optional[str] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if le is not None:
+        pairs.append(f'le="{le}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _histogram_lines(name: str, help: str, label_names: Sequence[str], family: dict) -> list:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    for values, histogram in sorted(family.items()):
+        snapshot = histogram.snapshot()
+        for bound, count in snapshot["buckets"]:
+            lines.append(f"{name}_bucket{_labels(label_names, values, str(bound))} {count}")
+        lines.append(f"{name}_bucket{_labels(label_names, values, '+Inf')} {snapshot['count']}")
+        lines.append(f"{name}_sum{_labels(label_names, values)} {snapshot['sum']}")
+        lines.append(f"{name}_count{_labels(label_names, values)} {snapshot['count']}")
+    return lines
+
+
+def _sample_lines(name: str, help: str, kind: str, label_names: Sequence[str], values: dict) -> list:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in sorted(values.items()):
+        lines.append(f"{name}{_labels(label_names, labels)} {value}")
+    return lines
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format (0.0.4)."""
+    pool = pool_metrics.stats()
+    lines = (
+        _histogram_lines("http_request_duration_seconds", "HTTP request latency by route.",
+                         ("method", "route", "status"), dict(http_metrics.duration.children))
+        + _histogram_lines("http_request_db_calls", "MongoDB commands issued per HTTP request.",
+                           ("method", "route"), dict(http_metrics.db_calls.children))
+        + _histogram_lines("mongodb_command_duration_seconds", "MongoDB command latency.",
+                           ("collection", "command"), dict(command_metrics.duration.children))
+        + _sample_lines("mongodb_command_failures_total", "Failed MongoDB commands.", "counter",
+                        ("collection", "command"), dict(command_metrics.failures.values))
+        + _sample_lines("mongodb_documents_returned_total", "Documents returned by MongoDB commands.", "counter",
+                        ("collection", "command"), dict(command_metrics.documents_returned.values))
+        + _sample_lines("mongodb_documents_written_total", "Documents written by MongoDB commands.", "counter",
+                        ("collection", "command"), dict(command_metrics.documents_written.values))
+        + _histogram_lines("mongodb_pool_checkout_wait_seconds", "Time waited to check a connection out of the pool.",
+                           (), {(): pool_metrics.checkout_wait})
+        + _sample_lines("mongodb_pool_checkout_failures_total", "Failed pool checkouts by reason.", "counter",
+                        ("reason",), {(reason,): count for reason, count in pool["checkout_failures"].items()})
+        + _sample_lines("mongodb_pool_connections", "Open pool connections.", "gauge", (), {(): pool["connections"]})
+        + _sample_lines("mongodb_pool_checked_out", "Connections checked out of the pool.", "gauge",
+                        (), {(): pool["checked_out"]})
+    )
+    return "\n".join(lines) + "\n"
+
+
+pool_metrics = PoolMetrics()
+command_metrics = CommandMetrics()
+http_metrics = HTTPMetrics()
@@ -0,0 +1,71 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque url-safe token holding the sort key and the values
+of the last document of the previous page. The next page is read with a
+range condition on (sort value, _id), so every page is an index seek
+instead of a skip over the previous pages.
+"""
+
+import base64
+from datetime import datetime
+from typing import Any, Optional
+
+from bson import ObjectId, json_util
+from fastapi import HTTPException, status
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+#Types a sort value can have; anything else (e.g. a dict) would reach the query as an operator
+CURSOR_VALUE_TYPES = (datetime, int, float, str, type(None))
+
+
+def encode_cursor(sort: str, value: Any, last_id: Any) -> str:
+    payload = json_util.dumps({"s": sort, "v": value, "id": last_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> tuple[Any, Any]:
+    """Return `(value, last_id)` from a cursor produced for `sort`."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json_util.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+        if payload["s"] != sort:
+            raise ValueError("cursor was issued for another sort order")
+        value, last_id = payload["v"], payload["id"]
+        if isinstance(value, bool) or not isinstance(value, CURSOR_VALUE_TYPES) or not isinstance(last_id, ObjectId):
+            raise ValueError("unexpected value types in cursor")
+        return value, last_id
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid pagination cursor.")
+
+
+def keyset_filter(sort: str, value: Any, last_id: Any, descending: bool = False) -> dict:
+    """
+    Condition selecting documents strictly after (value, last_id) in
+    ascending (sort, _id) order, or strictly before it when `descending`.
+
+    Missing/null sort values come first in ascending order, like Mongo
+    sorts them.
+    """
+    after = "$lt" if descending else "$gt"
+    if value is None:
+        if descending:
+            return {sort: None, "_id": {after: last_id}}
+        return {"$or": [{sort: {"$ne": None}}, {sort: None, "_id": {after: last_id}}]}
+    conditions = [{sort: {after: value}}, {sort: value, "_id": {after: last_id}}]
+    if descending:
+        conditions.append({sort: None})
+    return {"$or": conditions}
+
+
+def next_cursor(documents: list, limit: int, sort: str, get_value=None) -> Optional[str]:
+    """
+    Trim `documents` (fetched with `limit + 1`) to `limit` in place and
+    return the cursor of the following page, or None on the last page.
+    """
+    if len(documents) <= limit:
+        return None
+    del documents[limit:]
+    last = documents[-1]
+    value = get_value(last) if get_value else last.get(sort)
+    return encode_cursor(sort, value, last["_id"])
@@ -0,0 +1,122 @@
+"""
+Background deletion of projects.
+
+DELETE /projects/{id} only marks the project, in one conditional update:
+
+    {"status": "deleting", "deletion": {"requested_at": ..., "deleted": 0}}
+
+which hides it from every reader at once (see `LIVE_PROJECT` in
+services.authorization), and `project_deleter` then removes its tasks in
+the background, `project_delete_batch_size` at a time every
+`project_delete_batch_interval_seconds`, so deleting a large project
+neither blocks the request nor holds the collection with one huge
+`delete_many`. Each batch and its progress counter (`deletion.deleted`)
+are written in one transaction when the deployment supports them, and
+the project document and its statistics are removed last, in a final
+transaction. Every step is idempotent and a project is leased while it
+is processed, so an interrupted deletion is resumed after a restart or
+by another worker once its lease expires.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+from config import settings
+from db import get_database, run_in_transaction
+from services.analytics import analytics_cache
+from services.leased_worker import LeasedWorker
+from services.project_stats import drop_stats
+
+logger = logging.getLogger("inf3-projet-api")
+
+DELETING = "deleting"
+
+
+async def mark_deleting(project_filter: dict) -> Optional[dict]:
+    """
+    Mark the project matching `project_filter` as being deleted. Returns
+    the project, or None if nothing matched (including a deletion already
+    under way).
+    """
+    now = datetime.now()
+    project = await get_database()["projects"].find_one_and_update(
+        {**project_filter, "status": {"$ne": DELETING}},
+        {
+            "$set": {"status": DELETING, "deletion": {"requested_at": now, "deleted": 0}, "updated_at": now},
+            "$inc": {"revision": 1},
+        },
+        projection={"title": 1},
+        return_document=ReturnDocument.AFTER,
+    )
+    if project is not None:
+        project_deleter.wake()
+    return project
+
+
+class ProjectDeleter(LeasedWorker):
+    """Deletes the marked projects, oldest request first."""
+
+    collection = "projects"
+    kind = "Deletion of project"
+    sort = [("deletion.requested_at", ASCENDING)]
+    projection = {"title": 1, "deletion": 1}
+
+    def claim_filter(self, now: datetime) -> dict:
+        return {"status": DELETING, "$or": [
+            {"deletion.lease_until": {"$exists": False}},
+            {"deletion.lease_until": {"$lt": now}},
+        ]}
+
+    def claim_update(self, lease_until: datetime) -> dict:
+        return {"$set": {"deletion.lease_until": lease_until}}
+
+    async def _process(self, project: dict):
+        db = get_database()
+        project_id = project["_id"]
+        deleted = project.get("deletion", {}).get("deleted", 0)
+
+        while True:
+            # Unsorted: every batch is deleted, so any order will do, and
+            # the project._id prefix of the task indexes serves it as is
+            batch = await db["tasks"].find({"project._id": project_id}, {"_id": 1}).limit(
+                self.batch_size
+            ).to_list(length=self.batch_size)
+            if not batch:
+                break
+
+            async def delete_batch(session):
+                result = await db["tasks"].delete_many(
+                    {"_id": {"$in": [task["_id"] for task in batch]}}, session=session
+                )
+                await db["projects"].update_one(
+                    {"_id": project_id},
+                    {"$inc": {"deletion.deleted": result.deleted_count},
+                     "$set": {"deletion.lease_until": self._lease_until()}},
+                    session=session,
+                )
+                return result.deleted_count
+
+            deleted += await run_in_transaction(delete_batch)
+            await asyncio.sleep(self.batch_interval)
+
+        async def delete_document(session):
+            await db["projects"].delete_one({"_id": project_id, "status": DELETING}, session=session)
+            await drop_stats(project_id, session=session)
+
+        await run_in_transaction(delete_document)
+        # Tasks inserted by writes that checked the project just before it was marked
+        late = await db["tasks"].delete_many({"project._id": project_id})
+        await analytics_cache.invalidate(project_id)
+        logger.info(f"Deleted project '{project.get('title')}' and {deleted + late.deleted_count} tasks")
+
+
+project_deleter = ProjectDeleter(
+    batch_size=settings.project_delete_batch_size,
+    batch_interval=settings.project_delete_batch_interval_seconds,
+    lease=settings.project_delete_lease_seconds,
+    poll_interval=settings.project_delete_poll_interval_seconds,
+)
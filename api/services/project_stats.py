@@ -0,0 +1,350 @@
+"""
+Materialized per-project task statistics.
+
+One `project_stats` document per project (`_id` = project ID) holds the
+task counts the analytics endpoints need:
+
+    {
+        "total": 12,
+        "by_state": {"NOT STARTED": 7, ...},
+        "by_priority": {"HIGH": 3, ...},
+        "by_state_priority": {"NOT STARTED": {"HIGH": 2, ...}, ...},
+        "completed_by": {"<user id>": {"first_name": "Ann", "count": 4}, ...},
+        "revision": 42,
+    }
+
+The document is created empty with its project (`create_stats`; the
+projects created before that got theirs from migration 5 of
+services.indexes), and the task write handlers keep it current with a
+single `$inc` per write (see `record_task_change`), so reading the
+statistics is one `_id` lookup. `revision` and `updated_at` change on every task write and
+make up the ETag of the project's task lists (see `tasks_revision`).
+`rebuild_stats` recomputes a document from the tasks; run
+
+    python -m services.project_stats reconcile [--project ID] [--dry-run]
+    python -m services.project_stats rebuild [--project ID]
+
+to repair drift left by crashes or writes made outside the API.
+"""
+
+import argparse
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from db import get_database
+
+logger = logging.getLogger("inf3-projet-api")
+
+COLLECTION = "project_stats"
+_NONE_KEY = "~none"
+#Rebuilds retried when a task write bumps the revision meanwhile
+REBUILD_ATTEMPTS = 3
+
+
+def _key(value) -> str:
+    # Field names can't contain "." or start with "$"
+    if value is None:
+        return _NONE_KEY
+    return str(value).replace(".", "．").replace("$", "＄")
+
+
+def _unkey(key: str):
+    if key == _NONE_KEY:
+        return None
+    return key.replace("．", ".").replace("＄", "$")
+
+
+def _assignee(task: dict):
+    assigned_to = task.get("assigned_to")
+    if isinstance(assigned_to, dict) and assigned_to.get("_id") is not None:
+        return assigned_to
+    return None
+
+
+def _contribution(task: Optional[dict]) -> Counter:
+    """Counter paths a single task adds to its project's stats document."""
+    counts = Counter()
+    if task is None:
+        return counts
+    state, priority = _key(task.get("state")), _key(task.get("priority"))
+    counts["total"] += 1
+    counts[f"by_state.{state}"] += 1
+    counts[f"by_priority.{priority}"] += 1
+    counts[f"by_state_priority.{state}.{priority}"] += 1
+    assignee = _assignee(task)
+    if task.get("state") == "COMPLETED" and assignee is not None:
+        counts[f"completed_by.{assignee['_id']}.count"] += 1
+    return counts
+
+
+async def record_task_change(before: Optional[dict], after: Optional[dict]):
+    """
+    Apply the difference between two versions of a task to its project's
+    stats. Pass `before=None` for an insert and `after=None` for a delete.
+    """
+    await record_task_changes([(before, after)])
+
+
+async def record_task_changes(changes: list) -> set:
+    """
+    `record_task_change` for a batch of (before, after) pairs: one `$inc`
+    per project, whatever the number of tasks.
+
+    A project without a stats document (one the migration hasn't reached
+    yet, or whose document was dropped) gets it rebuilt from its tasks
+    instead: a delta alone would make a partial document that `get_stats`
+    then trusts. Returns the IDs of those rebuilt projects.
+    """
+    rebuilt = set()
+    updates = {}
+    for before, after in changes:
+        task = after or before
+        if task is None:
+            continue
+        project_id = task["project"]["_id"]
+        delta, first_names = updates.setdefault(project_id, (Counter(), {}))
+        delta.update(_contribution(after))
+        delta.subtract(_contribution(before))
+        assignee = _assignee(after) if after else None
+        if assignee is not None and after.get("state") == "COMPLETED":
+            first_names[f"completed_by.{assignee['_id']}.first_name"] = assignee.get("first_name")
+    for project_id, (delta, first_names) in updates.items():
+        inc = {path: n for path, n in delta.items() if n}
+        # Bumped even when no counter changes: the task lists did
+        inc["revision"] = 1
+        update = {"$inc": inc, "$set": {"updated_at": datetime.now(), **first_names}}
+        result = await get_database()[COLLECTION].update_one({"_id": project_id}, update)
+        if result.matched_count == 0:
+            await rebuild_stats(project_id)
+            rebuilt.add(project_id)
+    return rebuilt
+
+
+async def forget_assignee(project_id, user_id):
+    """Drop the completed count of a user whose tasks were all unassigned."""
+    await get_database()[COLLECTION].update_one(
+        {"_id": project_id}, {"$unset": {f"completed_by.{user_id}": ""}}
+    )
+
+
+async def touch_stats(project_id):
+    """Bump the task revision after a bulk task change that keeps the counts."""
+    result = await get_database()[COLLECTION].update_one(
+        {"_id": project_id}, {"$inc": {"revision": 1}, "$set": {"updated_at": datetime.now()}}
+    )
+    if result.matched_count == 0:
+        await rebuild_stats(project_id)
+
+
+async def bump_revision(project_id):
+    """Move the task revision of a project without touching its counts."""
+    await get_database()[COLLECTION].update_one(
+        {"_id": project_id}, {"$inc": {"revision": 1}, "$set": {"updated_at": datetime.now()}}
+    )
+
+
+async def tasks_revision(project_id) -> tuple:
+    """
+    Token that changes on every task write made through the API and on
+    every rebuild.
+    """
+    stats = await get_database()[COLLECTION].find_one({"_id": project_id}, {"revision": 1, "updated_at": 1})
+    if stats is None:
+        return (None, None)
+    return (stats.get("revision", 0), stats.get("updated_at"))
+
+
+async def drop_stats(project_id, session=None):
+    await get_database()[COLLECTION].delete_one({"_id": project_id}, session=session)
+
+
+def _empty_stats(project_id) -> dict:
+    return {"_id": project_id, "total": 0, "by_state": {}, "by_priority": {}, "by_state_priority": {}, "completed_by": {}}
+
+
+async def create_stats(project_id):
+    """
+    Insert the empty stats document of a new project, before any of its
+    tasks can be written, so every task write finds a document to `$inc`.
+    """
+    await get_database()[COLLECTION].insert_one({**_empty_stats(project_id), "revision": 0, "updated_at": datetime.now()})
+
+
+async def compute_stats(project_id) -> dict:
+    """Recompute the stats document of a project from its tasks."""
+    tasks = get_database()["tasks"]
+    stats = _empty_stats(project_id)
+    groups = await tasks.aggregate([
+        {"$match": {"project._id": project_id}},
+        {"$group": {"_id": {"state": "$state", "priority": "$priority"}, "n": {"$sum": 1}}},
+    ]).to_list(length=None)
+    for group in groups:
+        state, priority, n = _key(group["_id"].get("state")), _key(group["_id"].get("priority")), group["n"]
+        stats["total"] += n
+        stats["by_state"][state] = stats["by_state"].get(state, 0) + n
+        stats["by_priority"][priority] = stats["by_priority"].get(priority, 0) + n
+        stats["by_state_priority"].setdefault(state, {})[priority] = n
+    completed = await tasks.aggregate([
+        {"$match": {"project._id": project_id, "state": "COMPLETED", "assigned_to._id": {"$exists": True}}},
+        {"$group": {"_id": "$assigned_to._id", "first_name": {"$last": "$assigned_to.first_name"}, "count": {"$sum": 1}}},
+    ]).to_list(length=None)
+    for row in completed:
+        if row["_id"] is not None:
+            stats["completed_by"][str(row["_id"])] = {"first_name": row["first_name"], "count": row["count"]}
+    stats["updated_at"] = datetime.now()
+    return stats
+
+
+async def rebuild_stats(project_id) -> dict:
+    """
+    Recompute and store the stats document of a project.
+
+    The document is only replaced if its `revision` did not move while the
+    tasks were counted, so a concurrent `$inc` is never overwritten; the
+    rebuild is retried otherwise, up to `REBUILD_ATTEMPTS` times. A
+    missing document is inserted, then re-read: a task write counted above
+    may `$inc` it right after the insert, counting its task twice, so a
+    revision past the inserted one means counting again.
+    """
+    collection = get_database()[COLLECTION]
+    for _ in range(REBUILD_ATTEMPTS):
+        current = await collection.find_one({"_id": project_id}, {"revision": 1})
+        stats = await compute_stats(project_id)
+        if current is None:
+            stats["revision"] = 1
+            try:
+                await collection.insert_one(stats)
+            except DuplicateKeyError:
+                continue
+            inserted = await collection.find_one({"_id": project_id}, {"revision": 1})
+            if inserted is not None and inserted.get("revision") == 1:
+                return stats
+            continue
+        revision = current.get("revision")
+        stats["revision"] = (revision or 0) + 1
+        result = await collection.replace_one({"_id": project_id, "revision": revision}, stats)
+        if result.matched_count:
+            return stats
+    logger.warning("Stats of project %s kept changing during %d rebuilds, left as they are", project_id, REBUILD_ATTEMPTS)
+    return await collection.find_one({"_id": project_id}) or stats
+
+
+async def get_stats(project_id) -> dict:
+    """Return the stats of a project, building them on first use."""
+    stats = await get_database()[COLLECTION].find_one({"_id": project_id})
+    if stats is None:
+        stats = await rebuild_stats(project_id)
+    return stats
+
+
+# Readers returning the same shapes as the original aggregation endpoints
+
+def total_tasks_result(stats: dict) -> list:
+    total = stats.get("total", 0)
+    return [{"total_tasks": total}] if total > 0 else []
+
+
+def state_priority_result(stats: dict) -> list:
+    return [
+        {"_id": {"state": _unkey(state), "priority": _unkey(priority)}, "number_task": n}
+        for state, priorities in stats.get("by_state_priority", {}).items()
+        for priority, n in priorities.items()
+        if n > 0
+    ]
+
+
+def state_distribution_result(stats: dict) -> list:
+    states = {state: n for state, n in stats.get("by_state", {}).items() if n > 0}
+    total = sum(states.values())
+    return [
+        {"state": _unkey(state), "nb_of_tasks": n, "percentage": n / total * 100}
+        for state, n in states.items()
+    ]
+
+
+def productivity_result(stats: dict, limit: int) -> list:
+    rows = [
+        {"first_name": entry.get("first_name"), "tasks_completed": entry.get("count", 0)}
+        for entry in stats.get("completed_by", {}).values()
+        if entry.get("count", 0) > 0
+    ]
+    rows.sort(key=lambda row: row["tasks_completed"], reverse=True)
+    return rows[:limit] if limit > 0 else rows
+
+
+def _comparable(stats: Optional[dict]) -> dict:
+    """Stats without bookkeeping fields and zero counters, for drift checks."""
+    if stats is None:
+        return {}
+
+    def prune(value):
+        if isinstance(value, dict):
+            pruned = {k: prune(v) for k, v in value.items() if k != "first_name"}
+            return {k: v for k, v in pruned.items() if v not in (0, {})}
+        return value
+
+    return prune({k: v for k, v in stats.items() if k not in ("_id", "updated_at", "revision")})
+
+
+async def reconcile(project_id=None, dry_run: bool = False) -> int:
+    """
+    Compare stored stats with freshly computed ones and rewrite the ones
+    that drifted. Returns the number of drifted projects.
+    """
+    db = get_database()
+    query = {"_id": project_id} if project_id is not None else {}
+    drifted = 0
+    async for project in db["projects"].find(query, {"_id": 1}):
+        stored = await db[COLLECTION].find_one({"_id": project["_id"]})
+        fresh = await compute_stats(project["_id"])
+        if _comparable(stored) != _comparable(fresh):
+            drifted += 1
+            logger.warning("Stats drift for project %s%s", project["_id"], " (dry run)" if dry_run else "")
+            if not dry_run:
+                await rebuild_stats(project["_id"])
+    # Stats left behind by deleted projects
+    if project_id is None:
+        project_ids = await db["projects"].distinct("_id")
+        orphans = {"_id": {"$nin": project_ids}}
+        orphan_count = await db[COLLECTION].count_documents(orphans)
+        if orphan_count:
+            drifted += orphan_count
+            logger.warning("%d stats documents without a project%s", orphan_count, " (dry run)" if dry_run else "")
+            if not dry_run:
+                await db[COLLECTION].delete_many(orphans)
+    return drifted
+
+
+async def _main(args):
+    from db import close_mongo_connection, connect_to_mongo
+
+    await connect_to_mongo()
+    project_id = ObjectId(args.project) if args.project else None
+    try:
+        if args.command == "rebuild":
+            query = {"_id": project_id} if project_id is not None else {}
+            rebuilt = 0
+            async for project in get_database()["projects"].find(query, {"_id": 1}):
+                await rebuild_stats(project["_id"])
+                rebuilt += 1
+            print(f"{rebuilt} project(s) rebuilt")
+        else:
+            drifted = await reconcile(project_id, dry_run=args.dry_run)
+            print(f"{drifted} project(s) {'drifted' if args.dry_run else 'repaired'}")
+    finally:
+        await close_mongo_connection()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Rebuild/reconcile the materialized project task statistics.")
+    parser.add_argument("command", choices=["rebuild", "reconcile"])
+    parser.add_argument("--project", help="only this project ID")
+    parser.add_argument("--dry-run", action="store_true", help="report drift without fixing it")
+    asyncio.run(_main(parser.parse_args()))
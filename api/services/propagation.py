@@ -0,0 +1,213 @@
+"""
+Background propagation of renames into denormalized copies.
+
+Projects embed `first_name`/`last_name`/`email` of their members, tasks
+embed those of their assignee and the `project_title` of their project,
+and the project statistics keep the first name of every assignee with
+completed tasks. Reads rely on these copies, so renaming a user or a
+project only schedules a job in `propagation_jobs`:
+
+    {"kind": "user" | "project", "target_id": ..., "status": "pending",
+     "stage": 0, "last_id": None, "last_value": None, ...}
+
+and `propagator` rewrites the copies in the background, one batch of
+`propagation_batch_size` documents (`update_many` with array filters for
+the member arrays) every `propagation_batch_interval_seconds`, so request
+handlers never wait for it. Progress is saved after every batch and a job
+is leased while it runs, so an interrupted job is picked up where it
+stopped after a restart or by another worker once its lease expires. The
+new values are read from the user/project when the job runs, so jobs may
+run in any order and still leave the latest names everywhere.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from pymongo import ASCENDING
+
+from config import settings
+from db import get_database
+from services.analytics import analytics_cache
+from services.leased_worker import LeasedWorker
+from services.pagination import keyset_filter
+from services.project_stats import COLLECTION as STATS_COLLECTION, touch_stats
+
+logger = logging.getLogger("inf3-projet-api")
+
+COLLECTION = "propagation_jobs"
+
+
+class Stage(NamedTuple):
+    collection: str
+    query: dict
+    update: dict
+    array_filters: Optional[list] = None
+    projection: Optional[dict] = None
+    #Called with the documents (`projection`) of each updated batch
+    after_batch: Optional[Callable[[list], Awaitable[None]]] = None
+    #Field the batches are ordered by before _id (a keyset on (order, _id)),
+    #so that an index on (query field, order, _id) serves every batch;
+    #None to order by _id alone
+    order: Optional[str] = None
+
+
+async def _tasks_changed(tasks: list):
+    # Task lists and analytics of the touched projects changed; the
+    # revision bump invalidates both
+    for project_id in {task["project"]["_id"] for task in tasks}:
+        await touch_stats(project_id)
+
+
+async def _stats_changed(stats: list):
+    for document in stats:
+        await analytics_cache.invalidate(document["_id"])
+
+
+async def _user_stages(user: dict) -> list:
+    uid, now = user["_id"], datetime.now()
+    # The only stats holding the user's name are those of the projects of
+    # their completed tasks, found on the (assigned_to._id, state) index
+    project_ids = await get_database()["tasks"].distinct("project._id", {"assigned_to._id": uid, "state": "COMPLETED"})
+    reference = {"first_name": user["first_name"], "last_name": user["last_name"], "email": user["email"]}
+    return [
+        Stage(
+            "projects",
+            {"members._id": uid},
+            {
+                "$set": {**{f"members.$[m].{k}": v for k, v in reference.items()}, "updated_at": now},
+                "$inc": {"revision": 1},
+            },
+            array_filters=[{"m._id": uid}],
+        ),
+        Stage(
+            "tasks",
+            {"assigned_to._id": uid},
+            {"$set": {**{f"assigned_to.{k}": v for k, v in reference.items()}, "updated_at": now}},
+            projection={"project._id": 1},
+            after_batch=_tasks_changed,
+            order="created_at",
+        ),
+        Stage(
+            STATS_COLLECTION,
+            {"_id": {"$in": project_ids}, f"completed_by.{uid}": {"$exists": True}},
+            {"$set": {f"completed_by.{uid}.first_name": user["first_name"]}},
+            after_batch=_stats_changed,
+        ),
+    ]
+
+
+async def _project_stages(project: dict) -> list:
+    return [
+        Stage(
+            "tasks",
+            {"project._id": project["_id"]},
+            {"$set": {"project.project_title": project["title"], "updated_at": datetime.now()}},
+            projection={"project._id": 1},
+            after_batch=_tasks_changed,
+            order="created_at",
+        ),
+    ]
+
+
+#kind -> (source collection, stage builder)
+KINDS = {
+    "user": ("users", _user_stages),
+    "project": ("projects", _project_stages),
+}
+
+
+async def schedule_propagation(kind: str, target_id):
+    """Queue the propagation of the current names of a user or project."""
+    now = datetime.now()
+    await get_database()[COLLECTION].insert_one({
+        "kind": kind,
+        "target_id": target_id,
+        "status": "pending",
+        "stage": 0,
+        "last_id": None,
+        "last_value": None,
+        "created_at": now,
+        "updated_at": now,
+    })
+    propagator.wake()
+
+
+class Propagator(LeasedWorker):
+    """Runs the queued propagation jobs, oldest first."""
+
+    collection = COLLECTION
+    kind = "Propagation job"
+    sort = [("created_at", ASCENDING)]
+
+    def claim_filter(self, now: datetime) -> dict:
+        return {"$or": [
+            {"status": "pending"},
+            {"status": "running", "lease_until": {"$lt": now}},
+        ]}
+
+    def claim_update(self, lease_until: datetime) -> dict:
+        return {"$set": {"status": "running", "lease_until": lease_until}}
+
+    async def _process(self, job: dict):
+        db = get_database()
+        jobs = db[COLLECTION]
+        source_collection, build_stages = KINDS[job["kind"]]
+        source = await db[source_collection].find_one({"_id": job["target_id"]})
+        stages = await build_stages(source) if source is not None else []
+        updated = 0
+
+        for index in range(job.get("stage", 0), len(stages)):
+            stage = stages[index]
+            resumed = index == job.get("stage", 0)
+            last_id = job.get("last_id") if resumed else None
+            last_value = job.get("last_value") if resumed else None
+            projection = stage.projection or {"_id": 1}
+            sort = [("_id", ASCENDING)]
+            if stage.order is not None:
+                projection = {**projection, stage.order: 1}
+                sort = [(stage.order, ASCENDING), *sort]
+            while True:
+                query = dict(stage.query)
+                if last_id is not None and stage.order is not None:
+                    query.update(keyset_filter(stage.order, last_value, last_id))
+                elif last_id is not None:
+                    query["_id"] = {**query.get("_id", {}), "$gt": last_id}
+                batch = await db[stage.collection].find(query, projection).sort(sort).limit(
+                    self.batch_size
+                ).to_list(length=self.batch_size)
+                if not batch:
+                    break
+                result = await db[stage.collection].update_many(
+                    {"_id": {"$in": [document["_id"] for document in batch]}},
+                    stage.update,
+                    array_filters=stage.array_filters,
+                )
+                updated += result.modified_count
+                if stage.after_batch is not None:
+                    await stage.after_batch(batch)
+                last_id = batch[-1]["_id"]
+                last_value = batch[-1].get(stage.order) if stage.order is not None else None
+                await jobs.update_one({"_id": job["_id"]}, {"$set": {
+                    "stage": index,
+                    "last_id": last_id,
+                    "last_value": last_value,
+                    "updated_at": datetime.now(),
+                    "lease_until": self._lease_until(),
+                }})
+                await asyncio.sleep(self.batch_interval)
+
+        await jobs.update_one({"_id": job["_id"]}, {"$set": {
+            "status": "done", "stage": len(stages), "last_id": None, "last_value": None,
+            "updated_at": datetime.now(), "finished_at": datetime.now(),
+        }})
+        logger.info(f"Propagated {job['kind']} {job['target_id']} into {updated} documents")
+
+
+propagator = Propagator(
+    batch_size=settings.propagation_batch_size,
+    batch_interval=settings.propagation_batch_interval_seconds,
+    lease=settings.propagation_lease_seconds,
+    poll_interval=settings.propagation_poll_interval_seconds,
+)
@@ -0,0 +1,89 @@
+"""
+Refresh-token store.
+
+Refresh tokens are kept in their own `refresh_tokens` collection, keyed by
+an HMAC-SHA256 digest of the token, so checking one is a single `_id`
+lookup instead of a bcrypt verification. Each login opens a session
+(`session_id`); every refresh marks the presented token as used and
+issues a new one in the same session. Presenting an already used token
+means it leaked, so the whole session is revoked. Documents expire
+through the TTL index on `expires_at`.
+"""
+
+import hashlib
+import hmac
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from config import settings
+from db import get_database
+from services.auth import create_refresh_token, credentials_exception
+
+logger = logging.getLogger("inf3-projet-api")
+
+COLLECTION = "refresh_tokens"
+
+
+def token_digest(token: str) -> str:
+    return hmac.new(settings.secret_key.encode(), token.encode(), hashlib.sha256).hexdigest()
+
+
+async def issue_refresh_token(user: dict, session_id: Optional[str] = None) -> tuple[str, str]:
+    """
+    Create a refresh token for `user`, store its digest and return
+    `(token, session_id)`. A new session is opened when none is given.
+    """
+    session_id = session_id or uuid.uuid4().hex
+    token = create_refresh_token(data={"sub": user["email"], "sid": session_id, "jti": uuid.uuid4().hex})
+    now = datetime.utcnow()
+    try:
+        await get_database()[COLLECTION].insert_one({
+            "_id": token_digest(token),
+            "user_id": user["_id"],
+            "session_id": session_id,
+            "created_at": now,
+            "expires_at": now + timedelta(days=settings.refresh_token_expire_days),
+            "used_at": None,
+        })
+    except DuplicateKeyError:
+        # Only possible if the same token is issued twice, which the random jti rules out
+        raise credentials_exception
+    return token, session_id
+
+
+async def rotate_refresh_token(token: str) -> dict:
+    """
+    Atomically mark `token` as used and return its stored document.
+
+    Raises credentials_exception when the token is unknown, expired or
+    already used; on reuse the whole session is revoked.
+    """
+    collection = get_database()[COLLECTION]
+    digest = token_digest(token)
+    stored = await collection.find_one_and_update(
+        {"_id": digest, "used_at": None, "expires_at": {"$gt": datetime.utcnow()}},
+        {"$set": {"used_at": datetime.utcnow()}},
+    )
+    if stored is not None:
+        return stored
+
+    reused = await collection.find_one({"_id": digest}, {"session_id": 1, "user_id": 1, "used_at": 1})
+    if reused is not None and reused.get("used_at") is not None:
+        result = await collection.delete_many({"session_id": reused["session_id"]})
+        logger.warning(
+            "Refresh token reuse detected for user %s, revoked session %s (%d tokens)",
+            reused["user_id"], reused["session_id"], result.deleted_count,
+        )
+    raise credentials_exception
+
+
+async def revoke_session(session_id: str):
+    await get_database()[COLLECTION].delete_many({"session_id": session_id})
+
+
+async def revoke_user_sessions(user_id):
+    await get_database()[COLLECTION].delete_many({"user_id": user_id})
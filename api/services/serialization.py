@@ -0,0 +1,55 @@
+"""
+Fast JSON responses for trusted database documents.
+
+Documents read back from MongoDB were validated when the API wrote them,
+so the read endpoints can skip the `response_model` round trip (pydantic
+validation of every document, then the standard JSON encoder) and encode
+them straight to bytes with orjson. The routes keep their `response_model`,
+so the published OpenAPI schema does not change; `model_projection` limits
+the documents to the fields of that model so both paths return the same
+payload.
+"""
+
+from typing import Optional, Type
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+from config import settings
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content) -> bytes:
+    # datetimes, enums and nested dicts/lists are handled natively by orjson
+    return orjson.dumps(content, default=_default)
+
+
+class DocumentResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def model_projection(model: Type[BaseModel]) -> dict:
+    """Mongo projection of the (aliased) top-level fields of `model`."""
+    return {field.alias or name: 1 for name, field in model.model_fields.items()}
+
+
+def documents_response(documents, headers: Optional[dict] = None):
+    """
+    Return `documents` as a `DocumentResponse` when fast serialization is
+    on, or unchanged (validated against the route's `response_model`)
+    otherwise. `headers` are only needed on the fast path, since a returned
+    `Response` ignores the headers set on the injected one.
+    """
+    if not settings.fast_serialization:
+        return documents
+    return DocumentResponse(documents, headers=headers)
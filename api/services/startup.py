@@ -0,0 +1,145 @@
+"""
+Worker startup in two phases.
+
+The `lifespan` of main.py only runs the fast path (creating the Mongo
+client, which connects lazily, and starting the background workers), so
+a worker accepts traffic as soon as its modules are imported. The slower
+steps run afterwards in `startup`'s deferred task:
+
+- "mongo": first round-trip to the server, opening the pool (retried
+  until the server answers)
+- "schema": warns about pending migrations and missing registry indexes
+  (creates the missing ones when `sync_indexes_on_startup` is turned on)
+- "password_hasher": starts the bcrypt workers and loads passlib's bcrypt
+  backend, so the first login doesn't pay for it
+
+GET /readyz answers 503 until the deferred steps are done, so a rolling
+deploy or an autoscaler only sends traffic to warm workers. A failing
+step is retried with backoff; once it has used up its
+`startup_step_max_attempts`, GET /healthz answers 503 too, so the
+orchestrator restarts the worker instead of leaving it unready forever.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from config import settings
+from db import get_database
+from services.indexes import create_missing_indexes, warn_if_outdated
+from services.password_hashing import password_hasher
+
+logger = logging.getLogger("inf3-projet-api")
+
+
+async def _wait_for_mongo():
+    delay = 0.5
+    while True:
+        try:
+            await get_database().command("ping")
+            return
+        except Exception as error:
+            logger.warning("MongoDB not reachable yet (%s), retrying in %.1fs", error.__class__.__name__, delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 10)
+
+
+async def _check_schema():
+    if settings.sync_indexes_on_startup:
+        created = await create_missing_indexes(get_database())
+        if created:
+            logger.info("Created indexes %s", ", ".join(created))
+    await warn_if_outdated()
+
+
+class Startup:
+    def __init__(self):
+        #Phase durations in seconds ("imports", "fast_path", "deferred")
+        self.timings: dict = {}
+        #Deferred step -> "pending" | "running" | "retrying" | "done" | "failed"
+        self.steps: dict = {}
+        #Deferred step -> last error, while it is retried or once it failed
+        self.errors: dict = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def record(self, phase: str, seconds: float):
+        self.timings[phase] = seconds
+
+    @property
+    def ready(self) -> bool:
+        return bool(self.steps) and all(state == "done" for state in self.steps.values())
+
+    @property
+    def failed(self) -> bool:
+        """A deferred step gave up: the worker will never become ready."""
+        return "failed" in self.steps.values()
+
+    def start(self, steps: dict[str, Callable[[], Awaitable[None]]]):
+        """Run `steps` in order in the background."""
+        self.steps = {name: "pending" for name in steps}
+        self._task = asyncio.create_task(self._run(steps))
+
+    async def _run(self, steps: dict):
+        started = time.perf_counter()
+        for name, step in steps.items():
+            step_started = time.perf_counter()
+            if not await self._run_step(name, step):
+                # The following steps may depend on this one
+                break
+            logger.info("Startup step %s done in %.0f ms", name, (time.perf_counter() - step_started) * 1000)
+        self.record("deferred", time.perf_counter() - started)
+        logger.info("Worker %s", "ready" if self.ready else "failed to start: not ready, /healthz reports it")
+
+    async def _run_step(self, name: str, step: Callable[[], Awaitable[None]]) -> bool:
+        """
+        Run a step, retried with exponential backoff (like `_wait_for_mongo`)
+        up to `startup_step_max_attempts` times. Returns whether it succeeded.
+        """
+        delay = 0.5
+        for attempt in range(1, settings.startup_step_max_attempts + 1):
+            self.steps[name] = "running"
+            try:
+                await step()
+            except Exception as error:
+                self.errors[name] = f"{error.__class__.__name__}: {error}"
+                if attempt == settings.startup_step_max_attempts:
+                    self.steps[name] = "failed"
+                    logger.exception("Startup step %s failed after %d attempts", name, attempt)
+                    return False
+                self.steps[name] = "retrying"
+                logger.warning("Startup step %s failed (%s), retrying in %.1fs", name, self.errors[name], delay)
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 10)
+                continue
+            self.steps[name] = "done"
+            self.errors.pop(name, None)
+            return True
+        return False
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "steps": dict(self.steps),
+            "errors": dict(self.errors),
+            "timings_ms": {phase: round(seconds * 1000, 1) for phase, seconds in self.timings.items()},
+        }
+
+
+#Deferred steps, in order
+DEFERRED_STEPS = {
+    "mongo": _wait_for_mongo,
+    "schema": _check_schema,
+    "password_hasher": password_hasher.warm_up,
+}
+
+startup = Startup()
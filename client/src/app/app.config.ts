@@ -5,6 +5,7 @@ import { routes } from './app.routes';
 import { AuthGuard } from './guards/auth.guard';
 import { HTTP_INTERCEPTORS, provideHttpClient, withInterceptorsFromDi } from '@angular/common/http';
 import { AuthInterceptor } from './interceptors/auth-interceptor';
+import { EtagInterceptor } from './interceptors/etag-interceptor';
 
 export const appConfig: ApplicationConfig = {
   providers: [
@@ -17,6 +18,11 @@ export const appConfig: ApplicationConfig = {
       provide: HTTP_INTERCEPTORS,
       useClass: AuthInterceptor,
       multi: true
+    },
+    {
+      provide: HTTP_INTERCEPTORS,
+      useClass: EtagInterceptor,
+      multi: true
     }
   ]
 };
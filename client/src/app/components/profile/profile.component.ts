@@ -21,16 +21,21 @@ export class ProfileComponent implements OnInit{
   private authService = inject(AuthService);
   protected user = signal<TaskUserExtendedReference>({_id: '', email: '', first_name: '', last_name: ''});
   protected completedTasksCount = signal<number>(0);
+  protected overdueTasksCount = signal<number>(0);
   ngOnInit(): void {
     this.userService.getUserProfile().subscribe({
       next: (data) => this.user.set(data),
       error: () => this.user.set({_id: '', email: '', first_name: '', last_name: ''})
     });
-    this.userService.getUserTaskCountByState('COMPLETED').subscribe({
-      next: (data) => {
-        this.completedTasksCount.set(data[0].nb_of_tasks);
+    this.userService.getUserTaskSummary().subscribe({
+      next: (summary) => {
+        this.completedTasksCount.set(summary.by_state['COMPLETED'] ?? 0);
+        this.overdueTasksCount.set(summary.overdue);
       },
-      error: () => this.completedTasksCount.set(0)
+      error: () => {
+        this.completedTasksCount.set(0);
+        this.overdueTasksCount.set(0);
+      }
     });
   }
   signOut() {
@@ -1,13 +1,16 @@
-import { Component, inject, OnInit, signal } from '@angular/core';
+import { Component, inject, OnDestroy, OnInit, signal } from '@angular/core';
 import { ActivatedRoute, Router } from '@angular/router';
-import { ProjectService } from '../../../services/project.service';
+import { ProjectEventsClosed, ProjectService } from '../../../services/project.service';
 import { CommonModule } from '@angular/common';
-import { Project } from '../../../interfaces/project.interface';
+import { Project, ProjectEvent } from '../../../interfaces/project.interface';
 import { Task } from '../../../interfaces/task.interface';
 import { TaskService } from '../../../services/task.service';
 import { TaskCreateComponent } from '../task-create/task-create.component';
 import { NavbarComponent } from '../../shared/navbar/navbar.component';
 import { ProjectUserExtendedReference } from '../../../interfaces/user.interface';
+import { Subscription } from 'rxjs';
+
+const WS_TRY_AGAIN_LATER = 1013;
 
 @Component({
   selector: 'app-project-details',
@@ -15,7 +18,7 @@ import { ProjectUserExtendedReference } from '../../../interfaces/user.interface
   templateUrl: './project-details.html',
   styleUrls: ['./project-details.css'],
 })
-export class ProjectDetails implements OnInit{
+export class ProjectDetails implements OnInit, OnDestroy{
 
   private projectService = inject(ProjectService);
   private taskService = inject(TaskService);
@@ -23,7 +26,9 @@ export class ProjectDetails implements OnInit{
   private router = inject(Router);
   protected project = signal<Project|undefined>(undefined);
   protected tasks = signal<Task[]>([]);
+  protected nextCursor = signal<string|null>(null);
   protected showTaskCreate = signal<boolean>(false);
+  private events?: Subscription;
 
   ngOnInit() {
     const projectId = this.route.snapshot.paramMap.get('id');
@@ -37,11 +42,82 @@ export class ProjectDetails implements OnInit{
           console.error('Error fetching project details:', error);
         }
       });
-      // Fetch tasks for the project
-      this.taskService.getTasksByProjectId(projectId).subscribe({
-        next: (tasks) => {
-          console.log('Tasks fetched successfully:', tasks);
-          this.tasks.set(tasks);
+      // Fetch the first page of tasks for the project
+      this.loadTasks(projectId);
+      this.watchEvents(projectId);
+    }
+  }
+  private watchEvents(projectId: string) {
+    // Live updates made by the other members
+    this.events = this.projectService.watchProject(projectId).subscribe({
+      next: (event) => this.applyEvent(projectId, event),
+      error: (error) => {
+        console.error('Project event stream closed:', error);
+        if (error instanceof ProjectEventsClosed && error.code === WS_TRY_AGAIN_LATER) {
+          // Evicted for falling behind: events were missed, reload and listen again
+          this.loadTasks(projectId);
+          this.watchEvents(projectId);
+        }
+      }
+    });
+  }
+  ngOnDestroy() {
+    this.events?.unsubscribe();
+  }
+  private applyEvent(projectId: string, event: ProjectEvent) {
+    const task = event.task;
+    switch (event.type) {
+      case 'task.created':
+        if (task && !this.tasks().some(t => t._id === task._id)) {
+          this.tasks.set([...this.tasks(), task]);
+        }
+        break;
+      case 'task.updated':
+        if (task) {
+          this.tasks.set(this.tasks().map(t => t._id === task._id ? task : t));
+        }
+        break;
+      case 'task.deleted':
+        this.tasks.set(this.tasks().filter(t => t._id !== task?._id));
+        break;
+      case 'tasks.bulk':
+        // Only the IDs are sent: drop the deleted tasks, reload for the others
+        this.tasks.set(this.tasks().filter(t => !event.deleted?.includes(t._id)));
+        if (event.created?.length || event.updated?.length) {
+          this.loadTasks(projectId);
+        }
+        break;
+      case 'project.deleted':
+        this.router.navigate(['/projects']);
+        break;
+      default:
+        // Membership changes: members, roles and assignees may have changed
+        this.projectService.getProjectById(projectId).subscribe(proj => this.project.set(proj));
+        this.loadTasks(projectId);
+    }
+  }
+  private loadTasks(projectId: string) {
+    this.taskService.getTaskPage(projectId).subscribe({
+      next: (page) => {
+        console.log('Tasks fetched successfully:', page.tasks);
+        this.tasks.set(page.tasks);
+        this.nextCursor.set(page.next);
+      },
+      error: (error) => {
+        console.error('Error fetching tasks:', error);
+      }
+    });
+  }
+  loadMoreTasks() {
+    const projectId = this.project()?._id;
+    const cursor = this.nextCursor();
+    if (projectId && cursor) {
+      this.taskService.getTaskPage(projectId, cursor).subscribe({
+        next: (page) => {
+          // Skip tasks already added by a live event
+          const known = new Set(this.tasks().map(t => t._id));
+          this.tasks.set([...this.tasks(), ...page.tasks.filter(t => !known.has(t._id))]);
+          this.nextCursor.set(page.next);
         },
         error: (error) => {
           console.error('Error fetching tasks:', error);
@@ -72,15 +148,7 @@ export class ProjectDetails implements OnInit{
       next: (task) => {
         console.log('Task created successfully:', task);
         // Fetch tasks for the project
-        this.taskService.getTasksByProjectId(projectId).subscribe({
-          next: (tasks) => {
-            console.log('Tasks fetched successfully:', tasks);
-            this.tasks.set(tasks);
-          },
-          error: (error) => {
-            console.error('Error fetching tasks:', error);
-          }
-        });
+        this.loadTasks(projectId);
         this.toggleTaskCreate();
       },
       error: (error) => {
@@ -43,17 +43,11 @@ export class ProjectSettings implements OnInit, OnChanges, AfterViewInit{
         this.projectService.getProjectById(projectId).subscribe(project => {
           this.project.set(project);
         });
-        this.projectService.getUserProductivity(projectId).subscribe(members => {
-          this.topProductiveMembers.set(members);
-        });
-        this.projectService.getTaskCountByProjectId(projectId).subscribe(count => {
-          this.taskCount.set(count[0].total_tasks);
-        });
-        this.projectService.getTasksByStatePriority(projectId).subscribe(data => {
-          this.taskPriorityStateDistribution.set(data);
-        });
-        this.projectService.getTaskStateDistribution(projectId).subscribe(data => {
-          this.tasksStateDistribution.set(data);
+        this.projectService.getDashboard(projectId, ['productivity', 'total_tasks', 'state_priority_breakdown', 'state_distribution']).subscribe(dashboard => {
+          this.topProductiveMembers.set(dashboard.productivity ?? []);
+          this.taskCount.set(dashboard.total_tasks?.[0]?.total_tasks ?? 0);
+          this.taskPriorityStateDistribution.set(dashboard.state_priority_breakdown ?? []);
+          this.tasksStateDistribution.set(dashboard.state_distribution ?? []);
           this.updateStateChart();
         });
       }
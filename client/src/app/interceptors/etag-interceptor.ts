@@ -0,0 +1,56 @@
+import { Injectable } from '@angular/core';
+import {
+  HttpRequest,
+  HttpHandler,
+  HttpEvent,
+  HttpInterceptor,
+  HttpErrorResponse,
+  HttpResponse
+} from '@angular/common/http';
+import { Observable, of, throwError } from 'rxjs';
+import { catchError, tap } from 'rxjs/operators';
+
+const MAX_ENTRIES = 200;
+
+/**
+ * Conditional GETs: remembers the last response of every GET that came
+ * with an ETag, sends it back as If-None-Match and replays the remembered
+ * response when the API answers 304 Not Modified.
+ */
+@Injectable()
+export class EtagInterceptor implements HttpInterceptor {
+  private cache = new Map<string, HttpResponse<unknown>>();
+
+  intercept(request: HttpRequest<unknown>, next: HttpHandler): Observable<HttpEvent<unknown>> {
+    if (request.method !== 'GET') {
+      return next.handle(request);
+    }
+    const key = request.urlWithParams;
+    const cached = this.cache.get(key);
+    const etag = cached?.headers.get('ETag');
+    const req = etag ? request.clone({ setHeaders: { 'If-None-Match': etag } }) : request;
+
+    return next.handle(req).pipe(
+      tap(event => {
+        if (event instanceof HttpResponse && event.headers.has('ETag')) {
+          this.remember(key, event);
+        }
+      }),
+      catchError(error => {
+        // Angular reports anything outside 2xx, 304 included, as an error
+        if (error instanceof HttpErrorResponse && error.status === 304 && cached) {
+          return of(cached.clone());
+        }
+        return throwError(error);
+      })
+    );
+  }
+
+  private remember(key: string, response: HttpResponse<unknown>) {
+    this.cache.delete(key);
+    this.cache.set(key, response);
+    if (this.cache.size > MAX_ENTRIES) {
+      this.cache.delete(this.cache.keys().next().value as string);
+    }
+  }
+}
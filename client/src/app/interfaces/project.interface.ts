@@ -1,4 +1,5 @@
 import { ProjectUserExtendedReference } from "./user.interface";
+import { Task } from "./task.interface";
 
 export interface Project{
     _id: string;
@@ -10,4 +11,23 @@ export interface Project{
 export interface ProjectExtendedReference {
     id: string;
     project_title: string;
-}
\ No newline at end of file
+}
+export interface ProjectDashboard {
+    total_tasks?: { total_tasks: number }[];
+    state_priority_breakdown?: { _id: { state: string, priority: string }, number_task: number }[];
+    state_distribution?: { state: string, nb_of_tasks: number, percentage: number }[];
+    productivity?: { first_name: string; tasks_completed: number }[];
+    near_deadline?: Task[];
+}
+export interface ProjectEvent {
+    type: 'task.created' | 'task.updated' | 'task.deleted' | 'tasks.bulk' | 'member.added' | 'member.removed' | 'member.role_changed' | 'project.updated' | 'project.deleted';
+    project_id: string;
+    task?: Task;
+    created?: string[];
+    updated?: string[];
+    deleted?: string[];
+    user_id?: string;
+    role?: string;
+    title?: string;
+    description?: string;
+}
@@ -12,4 +12,12 @@ export interface Task {
     assigned_to: TaskUserExtendedReference | null;
     created_at: Date;
     updated_at: Date;
-}
\ No newline at end of file
+}
+
+export interface UserTaskSummary {
+    total: number;
+    by_state: Record<string, number>;
+    by_priority: Record<string, number>;
+    overdue: number;
+    overdue_by_priority: Record<string, number>;
+}
@@ -1,13 +1,28 @@
 import { inject, Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Project } from '../interfaces/project.interface';
+import { Project, ProjectDashboard, ProjectEvent } from '../interfaces/project.interface';
 import { environment } from '../../environments/environment';
+import { webSocket } from 'rxjs/webSocket';
+import { defer, EMPTY, Observable, throwError } from 'rxjs';
+import { catchError, concatWith, switchMap } from 'rxjs/operators';
+import { AuthService } from './auth.service';
+
+const WS_NORMAL_CLOSURE = 1000;
+const WS_POLICY_VIOLATION = 1008;
+
+// The project's event socket was closed by the API (or the network) with `code`
+export class ProjectEventsClosed extends Error {
+  constructor(public code: number, public reason: string) {
+    super(`Project event stream closed (${code}${reason ? ': ' + reason : ''})`);
+  }
+}
 @Injectable({
   providedIn: 'root'
 })
 export class ProjectService {
   private apiUrl = environment.apiUrl + 'projects';
   private http = inject(HttpClient);
+  private authService = inject(AuthService);
   getProjects() {
     // Implementation for fetching projects from the backend API
     return this.http.get<Project[]>(this.apiUrl);
@@ -46,7 +61,41 @@ export class ProjectService {
   getTaskStateDistribution(projectId: string) {
     return this.http.get<{state: string, nb_of_tasks: number, percentage: number}[]>(`${this.apiUrl}/${projectId}/tasks-state-distribution`);
   }
+  getDashboard(projectId: string, include: string[] = [], limit: number = 3) {
+    // All analytics of the project page in one round-trip
+    const params: Record<string, string | number> = { limit };
+    if (include.length) params['include'] = include.join(',');
+    return this.http.get<ProjectDashboard>(`${this.apiUrl}/${projectId}/dashboard`, { params });
+  }
   getTasksNearingDeadlines(projectId: string, inXDays: number=5) {
     return this.http.get<{ title: string; deadline: string }[]>(`${this.apiUrl}/${projectId}/tasks-nearing-deadlines?inXDays=${inXDays}`);
   }
-}
\ No newline at end of file
+  watchProject(projectId: string): Observable<ProjectEvent> {
+    // Task and membership changes pushed by the API; the socket is opened on subscribe and closed on unsubscribe.
+    // The API closes it with 1008 "Token expired" when the token it was opened with expires: it is then reopened
+    // with the current access token (refreshed first if it is still the same one). A normal close (project
+    // deleted, member removed) completes; any other one, e.g. 1013 when this client fell behind, is an error.
+    const connect = (token?: string): Observable<ProjectEvent> => defer(() => {
+      let closed: CloseEvent | undefined;
+      const openedWith = token ?? this.authService.getAccessToken();
+      const url = `${this.apiUrl.replace(/^http/, 'ws')}/${projectId}/events?token=${encodeURIComponent(openedWith ?? '')}`;
+      return webSocket<ProjectEvent>({ url, closeObserver: { next: event => closed = event } }).pipe(
+        catchError(error => throwError(() => closed ? new ProjectEventsClosed(closed.code, closed.reason) : error)),
+        concatWith(defer(() => {
+          if (closed?.code === WS_POLICY_VIOLATION && closed.reason === 'Token expired') {
+            const current = this.authService.getAccessToken();
+            return current && current !== openedWith
+              ? connect(current)
+              : this.authService.refreshToken().pipe(switchMap(tokens => connect(tokens.access_token)));
+          }
+          if (!closed || closed.code === WS_NORMAL_CLOSURE) {
+            return EMPTY;
+          }
+          const { code, reason } = closed;
+          return throwError(() => new ProjectEventsClosed(code, reason));
+        }))
+      );
+    });
+    return connect();
+  }
+}
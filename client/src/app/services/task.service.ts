@@ -2,14 +2,35 @@ import { inject, Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
 import { Task } from '../interfaces/task.interface';
 import { environment } from '../../environments/environment';
+import { map } from 'rxjs/operators';
+
+const TASK_PAGE_SIZE = 100;
+// Columns of the project's task list; the details page loads the whole task
+const TASK_LIST_FIELDS = 'title,priority,state,assigned_to';
+
 @Injectable({
   providedIn: 'root'
 })
 export class TaskService {
   private apiUrl = environment.apiUrl + 'projects';
   private http = inject(HttpClient);
-  getTasksByProjectId(projectId: string) {
-    return this.http.get<Task[]>(`${this.apiUrl}/${projectId}/tasks`);
+  getTaskPage(projectId: string, cursor?: string) {
+    // One page of the task list, with only the fields the list shows; pass back `next` as `cursor`
+    const params: Record<string, string> = { limit: String(TASK_PAGE_SIZE), fields: TASK_LIST_FIELDS };
+    if (cursor) params['cursor'] = cursor;
+    return this.http.get<Task[]>(`${this.apiUrl}/${projectId}/tasks`, { observe: 'response', params }).pipe(
+      map(res => ({ tasks: res.body ?? [], next: res.headers.get('X-Next-Cursor') }))
+    );
+  }
+  searchTasks(projectId: string, q: string, filters: { state?: string; priority?: string; cursor?: string } = {}) {
+    // One relevance-ranked page; pass back `next` as `cursor` for the following one
+    const params: Record<string, string> = { q };
+    for (const [key, value] of Object.entries(filters)) {
+      if (value) params[key] = value;
+    }
+    return this.http.get<(Task & { score: number })[]>(`${this.apiUrl}/${projectId}/tasks/search`, { observe: 'response', params }).pipe(
+      map(res => ({ tasks: res.body ?? [], next: res.headers.get('X-Next-Cursor') }))
+    );
   }
   createTask(projectId: string, task: Partial<Task>) {
     return this.http.post<Task>(`${this.apiUrl}/${projectId}/tasks`, task);
@@ -1,7 +1,9 @@
 import { inject, Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
+import { map } from 'rxjs';
 import { environment } from '../../environments/environment';
 import { TaskUserExtendedReference } from '../interfaces/user.interface';
+import { Task, UserTaskSummary } from '../interfaces/task.interface';
 @Injectable({
   providedIn: 'root'
 })
@@ -15,4 +17,18 @@ export class UserService {
   getUserTaskCountByState(state: string) {
     return this.http.get<any>(`${this.apiUrl}/me/task-count?state=${state}`);
   }
+  getUserTaskSummary() {
+    // Counts per state and priority plus overdue tasks, in one request
+    return this.http.get<UserTaskSummary>(`${this.apiUrl}/me/summary`);
+  }
+  getUserTasks(filters: { state?: string; priority?: string; project?: string; sort?: string; cursor?: string } = {}) {
+    // One page of the tasks assigned to the user, across projects; pass back `next` as `cursor`
+    const params: Record<string, string> = {};
+    for (const [key, value] of Object.entries(filters)) {
+      if (value) params[key] = value;
+    }
+    return this.http.get<Task[]>(`${this.apiUrl}/me/tasks`, { observe: 'response', params }).pipe(
+      map(res => ({ tasks: res.body ?? [], next: res.headers.get('X-Next-Cursor') }))
+    );
+  }
 }
\ No newline at end of file